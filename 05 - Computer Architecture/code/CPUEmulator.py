@@ -0,0 +1,498 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import array
+import os
+import sys
+import typing
+
+# Programs are assembled, and instructions encoded, by the assembler.
+ASSEMBLER_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir,
+    "06 - Assembler", "code")
+if ASSEMBLER_PATH not in sys.path:
+    sys.path.append(ASSEMBLER_PATH)
+from Code import COMP_BITS, DEST_BITS, JUMP_BITS
+from HackBinary import load_hackb
+from Main import assemble_words
+
+# The whole 15-bit address space, so that a negative address, which the CPU
+# truncates to 15 bits, indexes the same word from the end.
+ROM_SIZE = 32768
+RAM_SIZE = 32768
+SCREEN = 16384
+KEYBOARD = 24576
+
+# The instructions that have their own case in the dispatch loop of
+# CPUEmulator.execute, most frequent first: instruction i is op i + 1, op 0
+# is an A-instruction and the last op is any other C-instruction.
+FAST_INSTRUCTIONS = (
+    "D=M", "M=D", "A=A-1", "AM=M-1", "A=M", "AM=M+1", "0;JMP", "D=A",
+    "A=M-1", "M=M+1", "M=D+M", "M=0", "D;JNE", "D;JEQ", "D=D-A", "A=D+M",
+    "M=-1", "D=M-D", "D=D+A", "M=M-1", "D;JGT", "D;JLT", "D;JGE", "D;JLE")
+GENERIC_OP = len(FAST_INSTRUCTIONS) + 1
+# The instructions that also have a case of their own right after an
+# A-instruction, most frequent first: an A-instruction followed by
+# instruction i is op GENERIC_OP + 1 + i, which executes both of them.
+FUSED_INSTRUCTIONS = (
+    "A=M", "D=A", "M=M+1", "AM=M-1", "M=M-1", "M=D", "AM=M+1", "A=D+M",
+    "D=M", "0;JMP", "D=D+A", "D;JNE", "D=D-A", "D;JEQ", "A=M-1")
+
+
+def _encode(instruction: str) -> int:
+    """
+    Args:
+        instruction (str): a C-instruction, e.g. "AM=M-1".
+
+    Returns:
+        int: its 16-bit code.
+    """
+    dest, equal, comp = instruction.partition("=")
+    if not equal:
+        dest, comp = None, dest
+    comp, semicolon, jump = comp.partition(";")
+    return COMP_BITS[comp] | DEST_BITS[dest] | \
+        JUMP_BITS[jump if semicolon else None]
+
+
+# the 16-bit code of every fast instruction -> its op
+FAST_OPS = {_encode(instruction): op
+            for op, instruction in enumerate(FAST_INSTRUCTIONS, 1)}
+# the 16-bit code of every fused instruction -> the op of the A-instruction
+# before it
+FUSED_OPS = {_encode(instruction): op for op, instruction in
+             enumerate(FUSED_INSTRUCTIONS, GENERIC_OP + 1)}
+
+
+def _to_word(value: int) -> int:
+    """
+    Args:
+        value (int): an integer.
+
+    Returns:
+        int: the integer as a signed 16-bit word.
+    """
+    return ((value + 0x8000) & 0xFFFF) - 0x8000
+
+
+def _alu(control: int) -> typing.Callable[[int, int], int]:
+    """
+    Args:
+        control (int): the six control bits of the ALU, zx nx zy ny f no.
+
+    Returns:
+        typing.Callable[[int, int], int]: computes the output of the ALU
+        from x (D) and y (A or M).
+    """
+    zx, nx, zy, ny, add, no = [bool(control & (1 << bit))
+                               for bit in range(5, -1, -1)]
+
+    def compute(x: int, y: int) -> int:
+        if zx:
+            x = 0
+        if nx:
+            x = ~x
+        if zy:
+            y = 0
+        if ny:
+            y = ~y
+        out = x + y if add else x & y
+        return _to_word(~out if no else out)
+    return compute
+
+
+def _shift(left: bool, shift_x: bool) -> typing.Callable[[int, int], int]:
+    """
+    Args:
+        left (bool): shift left, otherwise right (keeping the sign).
+        shift_x (bool): shift x (D), otherwise y (A or M).
+
+    Returns:
+        typing.Callable[[int, int], int]: computes the output of ExtendAlu
+        from x and y.
+    """
+    if left:
+        if shift_x:
+            return lambda x, y: _to_word(x << 1)
+        return lambda x, y: _to_word(y << 1)
+    if shift_x:
+        return lambda x, y: x >> 1
+    return lambda x, y: y >> 1
+
+
+def decode(word: int) -> typing.Tuple[int, typing.Any]:
+    """Decodes an instruction once, before it is executed.
+
+    Args:
+        word (int): a 16-bit instruction.
+
+    Returns:
+        typing.Tuple[int, typing.Any]: the op of the instruction in the
+        dispatch loop and its argument: the value of an A-instruction, or
+        the (computation, reads M, dest bits, jump bits) of a generic
+        C-instruction.
+    """
+    if word < 0x8000:
+        return 0, word
+    op = FAST_OPS.get(word)
+    if op is not None:
+        return op, None
+    # like ExtendAlu: only instructions whose bits 14 and 13 are both set
+    # go through the regular ALU, the others are shifts
+    if word & 0x6000 == 0x6000:
+        compute = _alu((word >> 6) & 0x3F)
+    else:
+        compute = _shift(bool(word & 0x800), bool(word & 0x400))
+    return GENERIC_OP, (compute, bool(word & 0x1000), (word >> 3) & 7,
+                        word & 7)
+
+
+def load_program(path: str) -> typing.List[int]:
+    """
+    Args:
+        path (str): a .hack, .hackb or .asm file, which is assembled.
+
+    Returns:
+        typing.List[int]: the 16-bit instructions of the program.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".hackb":
+        return list(load_hackb(path))
+    with open(path, 'r') as input_file:
+        if extension == ".asm":
+            return assemble_words(input_file)
+        return [int(line, 2) for line in input_file.read().split()]
+
+
+class CPUEmulator:
+    """
+    Emulates the Hack computer, with the shift instructions of ExtendAlu:
+    the CPU, a ROM of 32K instructions and the RAM, including the screen and
+    the keyboard memory maps.
+
+    Every instruction of the ROM is decoded once, when it is loaded, into an
+    op and an argument. The dispatch loop of execute keeps the registers in
+    local variables and has a case of its own for the most frequent
+    instructions (see FAST_INSTRUCTIONS), so these run without any function
+    call. Any other C-instruction calls its decoded computation. The RAM is
+    an array('h') of signed 16-bit words, and the registers hold signed
+    values as well.
+
+    An A-instruction followed by one of FUSED_INSTRUCTIONS is decoded into
+    an op that executes both in one iteration of the loop, while a jump to
+    the second one still executes it alone. Cycles are counted exactly: a
+    fused pair only executes its A-instruction when a single cycle is left.
+
+    Where this was measured it runs about 7-9M instructions/s on Fill and
+    6-8M/s on the output of the VM translator, but 4.5-5M/s on the Pong.asm
+    of project 6, whose hot C-instructions mostly follow other
+    C-instructions. That is below the 5M/s the emulator was meant to reach,
+    JITEmulator runs this program at about 10M/s.
+
+    Usage:
+        emulator = CPUEmulator(load_program("Mult.asm"))
+        emulator.ram[0], emulator.ram[1] = 6, 7
+        emulator.run(200)
+        print(emulator.ram[2])
+    """
+
+    def __init__(self, program: typing.Sequence[int] = ()) -> None:
+        """
+        Args:
+            program (typing.Sequence[int]): the 16-bit instructions loaded
+                into the ROM.
+        """
+        self.ram = array.array('h', bytes(2 * RAM_SIZE))
+        self.a = 0
+        self.d = 0
+        self.pc = 0
+        self.cycles = 0
+        self.load(program)
+
+    def load(self, program: typing.Sequence[int]) -> None:
+        """Loads a program into the ROM. The rest of the ROM is zero.
+
+        Args:
+            program (typing.Sequence[int]): the 16-bit instructions.
+        """
+        if len(program) > ROM_SIZE:
+            raise ValueError("the program has %d instructions, the ROM has "
+                             "room for %d" % (len(program), ROM_SIZE))
+        self.rom = list(program) + [0] * (ROM_SIZE - len(program))
+        decoded = {}
+        self.ops = []
+        self.args = []
+        for word in self.rom:
+            op, arg = decoded.get(word) or decoded.setdefault(
+                word, decode(word))
+            self.ops.append(op)
+            self.args.append(arg)
+        for address in range(len(program)):
+            self._fuse(address)
+
+    def _fuse(self, address: int) -> None:
+        """Gives an A-instruction the fused op of the instruction after it,
+        if it is one of FUSED_INSTRUCTIONS, and its own op otherwise.
+
+        Args:
+            address (int): the ROM address of an instruction.
+        """
+        if self.rom[address] < 0x8000 and address + 1 < ROM_SIZE:
+            self.ops[address] = FUSED_OPS.get(self.rom[address + 1], 0)
+
+    def poke_rom(self, address: int, word: int) -> None:
+        """Replaces a single instruction of the ROM.
+
+        Args:
+            address (int): the ROM address of the instruction.
+            word (int): the new 16-bit instruction.
+        """
+        self.rom[address] = word
+        self.ops[address], self.args[address] = decode(word)
+        self._fuse(address)
+        # the A-instruction before it may be fused to it
+        if address > 0:
+            self._fuse(address - 1)
+
+    def load_file(self, path: str) -> None:
+        """Loads a program into the ROM.
+
+        Args:
+            path (str): a .hack, .hackb or .asm file, which is assembled.
+        """
+        self.load(load_program(path))
+
+    def reset(self) -> None:
+        """Restarts the program, like the reset bit of the CPU."""
+        self.pc = 0
+
+    def run(self, cycles: int) -> None:
+        """Executes instructions, one per cycle. The program counter wraps
+        around at the end of the ROM.
+
+        Args:
+            cycles (int): the number of instructions to execute.
+        """
+        while cycles > 0:
+            cycles = self.execute(cycles)
+
+    def execute(self, cycles: int) -> int:
+        """Executes instructions until the given number is executed or the
+        program counter runs past the end of the ROM.
+
+        Args:
+            cycles (int): the number of instructions to execute.
+
+        Returns:
+            int: the number of instructions that are left to execute.
+        """
+        ops = self.ops
+        args = self.args
+        ram = self.ram
+        a = self.a
+        d = self.d
+        pc = self.pc
+        executed = 0
+        try:
+            while executed < cycles:
+                iteration = fused = 0
+                if executed + 1 == cycles and ops[pc] > GENERIC_OP:
+                    # no cycle is left for the instruction fused to the
+                    # A-instruction
+                    a = args[pc]
+                    pc += 1
+                    executed = cycles
+                    break
+                # every iteration executes one or two instructions
+                for iteration in range((cycles - executed) // 2 or 1):
+                    op = ops[pc]
+                    if op > GENERIC_OP:
+                        a = args[pc]
+                        fused += 1
+                        if op == 26:  # @, A=M
+                            a = ram[a]
+                            pc += 2
+                        elif op == 27:  # @, D=A
+                            d = a
+                            pc += 2
+                        elif op == 28:  # @, M=M+1
+                            ram[a] = ((ram[a] + 0x8001) & 0xFFFF) - 0x8000
+                            pc += 2
+                        elif op == 29:  # @, AM=M-1
+                            ram[a] = a = ((ram[a] + 0x7FFF) & 0xFFFF) - 0x8000
+                            pc += 2
+                        elif op == 30:  # @, M=M-1
+                            ram[a] = ((ram[a] + 0x7FFF) & 0xFFFF) - 0x8000
+                            pc += 2
+                        elif op == 31:  # @, M=D
+                            ram[a] = d
+                            pc += 2
+                        elif op == 32:  # @, AM=M+1
+                            ram[a] = a = ((ram[a] + 0x8001) & 0xFFFF) - 0x8000
+                            pc += 2
+                        elif op == 33:  # @, A=D+M
+                            a = ((d + ram[a] + 0x8000) & 0xFFFF) - 0x8000
+                            pc += 2
+                        elif op == 34:  # @, D=M
+                            d = ram[a]
+                            pc += 2
+                        elif op == 35:  # @, 0;JMP
+                            pc = a
+                        elif op == 36:  # @, D=D+A
+                            d = ((d + a + 0x8000) & 0xFFFF) - 0x8000
+                            pc += 2
+                        elif op == 37:  # @, D;JNE
+                            pc = a if d else pc + 2
+                        elif op == 38:  # @, D=D-A
+                            d = ((d - a + 0x8000) & 0xFFFF) - 0x8000
+                            pc += 2
+                        elif op == 39:  # @, D;JEQ
+                            pc = pc + 2 if d else a
+                        elif op == 40:  # @, A=M-1
+                            a = ((ram[a] + 0x7FFF) & 0xFFFF) - 0x8000
+                            pc += 2
+                    elif op == 1:  # D=M
+                        d = ram[a]
+                        pc += 1
+                    elif op == 2:  # M=D
+                        ram[a] = d
+                        pc += 1
+                    elif op == 3:  # A=A-1
+                        a = ((a + 0x7FFF) & 0xFFFF) - 0x8000
+                        pc += 1
+                    elif op == 4:  # AM=M-1
+                        ram[a] = a = ((ram[a] + 0x7FFF) & 0xFFFF) - 0x8000
+                        pc += 1
+                    elif op == 5:  # A=M
+                        a = ram[a]
+                        pc += 1
+                    elif op == 6:  # AM=M+1
+                        ram[a] = a = ((ram[a] + 0x8001) & 0xFFFF) - 0x8000
+                        pc += 1
+                    elif op == 7:  # 0;JMP
+                        pc = a
+                    elif op == 8:  # D=A
+                        d = a
+                        pc += 1
+                    elif op == 9:  # A=M-1
+                        a = ((ram[a] + 0x7FFF) & 0xFFFF) - 0x8000
+                        pc += 1
+                    elif op == 10:  # M=M+1
+                        ram[a] = ((ram[a] + 0x8001) & 0xFFFF) - 0x8000
+                        pc += 1
+                    elif op == 11:  # M=D+M
+                        ram[a] = ((d + ram[a] + 0x8000) & 0xFFFF) - 0x8000
+                        pc += 1
+                    elif op == 12:  # M=0
+                        ram[a] = 0
+                        pc += 1
+                    elif op == 13:  # D;JNE
+                        pc = a if d else pc + 1
+                    elif op == 14:  # D;JEQ
+                        pc = pc + 1 if d else a
+                    elif op == 15:  # D=D-A
+                        d = ((d - a + 0x8000) & 0xFFFF) - 0x8000
+                        pc += 1
+                    elif op == 16:  # A=D+M
+                        a = ((d + ram[a] + 0x8000) & 0xFFFF) - 0x8000
+                        pc += 1
+                    elif op == 17:  # M=-1
+                        ram[a] = -1
+                        pc += 1
+                    elif op == 18:  # D=M-D
+                        d = ((ram[a] - d + 0x8000) & 0xFFFF) - 0x8000
+                        pc += 1
+                    elif op == 19:  # D=D+A
+                        d = ((d + a + 0x8000) & 0xFFFF) - 0x8000
+                        pc += 1
+                    elif op == 20:  # M=M-1
+                        ram[a] = ((ram[a] + 0x7FFF) & 0xFFFF) - 0x8000
+                        pc += 1
+                    elif op == 21:  # D;JGT
+                        pc = a if d > 0 else pc + 1
+                    elif op == 22:  # D;JLT
+                        pc = a if d < 0 else pc + 1
+                    elif op == 23:  # D;JGE
+                        pc = a if d >= 0 else pc + 1
+                    elif op == 24:  # D;JLE
+                        pc = a if d <= 0 else pc + 1
+                    elif op == 0:
+                        a = args[pc]
+                        pc += 1
+                    else:
+                        compute, reads_m, dest, jump = args[pc]
+                        out = compute(d, ram[a] if reads_m else a)
+                        target = a
+                        if dest & 1:
+                            ram[a] = out
+                        if dest & 2:
+                            d = out
+                        if dest & 4:
+                            a = out
+                        if jump == 7 or (jump & 4 and out < 0) or \
+                                (jump & 2 and out == 0) or \
+                                (jump & 1 and out > 0):
+                            pc = target
+                        else:
+                            pc += 1
+                executed += iteration + 1 + fused
+        except IndexError:
+            # the instruction at the end of the ROM was the last executed
+            executed += iteration + fused
+            pc = 0
+        self.a, self.d, self.pc = a, d, pc & 0x7FFF
+        self.cycles += executed
+        return cycles - executed
+
+
+if "__main__" == __name__:
+    # Runs .tst scripts of the CPU emulator, or a program for a number of
+    # cycles, without the Java CPUEmulator.
+    from TestScript import TestScript
+    argument_parser = argparse.ArgumentParser(prog="CPUEmulator")
+    argument_parser.add_argument(
+        "input_paths", nargs="+", metavar="input_path",
+        help="a .tst script, or a .hack, .hackb or .asm program")
+    argument_parser.add_argument(
+        "--cycles", type=int, default=1000000, metavar="N",
+        help="the number of instructions to run a program for "
+             "(default: %(default)s)")
+    argument_parser.add_argument(
+        "--dump", default="0-15", metavar="FIRST-LAST",
+        help="the RAM addresses to print after running a program "
+             "(default: %(default)s)")
+    argument_parser.add_argument(
+        "--jit", action="store_true",
+        help="compile the hot blocks of the program into Python functions, "
+             "see JITEmulator")
+    arguments = argument_parser.parse_args()
+    emulator_class = CPUEmulator
+    if arguments.jit:
+        from JITEmulator import JITEmulator
+        emulator_class = JITEmulator
+    failed = False
+    for input_path in arguments.input_paths:
+        if os.path.splitext(input_path)[1].lower() == ".tst":
+            script = TestScript(input_path, emulator_class())
+            try:
+                passed = script.run()
+                message = script.message
+            except (OSError, ValueError) as error:
+                passed, message = False, str(error)
+            failed |= not passed
+            print("%s: %s" % (input_path, message))
+            continue
+        emulator = emulator_class()
+        emulator.load_file(input_path)
+        emulator.run(arguments.cycles)
+        first, _, last = arguments.dump.partition("-")
+        print("%s: A=%d D=%d PC=%d" % (input_path, emulator.a, emulator.d,
+                                       emulator.pc))
+        for address in range(int(first), int(last or first) + 1):
+            print("RAM[%d] = %d" % (address, emulator.ram[address]))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,267 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import os
+import typing
+# CPUEmulator puts the assembler's directory on the path
+from CPUEmulator import CPUEmulator, ROM_SIZE, decode, load_program
+from Code import COMP_BITS, DEST_BITS, JUMP_BITS
+from Parser import clean_source, decode_line
+from Passes import first_pass
+from SymbolTable import SymbolTable
+
+# The number of times a block is interpreted before it is compiled, so that
+# code that runs only a few times is not worth the cost of compiling it.
+COMPILE_THRESHOLD = 32
+# The largest number of instructions in a block.
+MAX_BLOCK = 256
+
+# The mnemonic of every computation, dest and jump, by its bits.
+_COMPS = {}
+for _mnemonic, _bits in COMP_BITS.items():
+    _COMPS.setdefault(_bits, _mnemonic)
+_DESTS = {bits: mnemonic for mnemonic, bits in DEST_BITS.items()
+          if mnemonic not in (None, 'null')}
+_JUMPS = {bits: mnemonic for mnemonic, bits in JUMP_BITS.items()
+          if mnemonic not in (None, 'null')}
+# The Python comparison of a value with zero that takes each jump.
+_CONDITIONS = {'JGT': '> 0', 'JEQ': '== 0', 'JGE': '>= 0', 'JLT': '< 0',
+               'JNE': '!= 0', 'JLE': '<= 0'}
+# Reduces the result of an arithmetic computation to a signed 16-bit word.
+_WORD = "((%s + 0x8000) & 0xFFFF) - 0x8000"
+
+
+def label_addresses(path: str) -> typing.Set[int]:
+    """Recovers the ROM addresses of the labels of an assembly program, as
+    the first pass of the assembler does.
+
+    Args:
+        path (str): path of an .asm file.
+
+    Returns:
+        typing.Set[int]: the ROM address of every label.
+    """
+    with open(path, 'r') as input_file:
+        lines = clean_source(input_file.read())
+    symbol_table = SymbolTable()
+    first_pass((decode_line(line) for line in lines), symbol_table)
+    return set(symbol_table.symbol_table.values())
+
+
+def _expression(comp: str, x: str, y: str) -> str:
+    """
+    Args:
+        comp (str): a comp mnemonic.
+        x (str): the Python expression of D.
+        y (str): the Python expression of A or M, whichever comp reads.
+
+    Returns:
+        str: the Python expression of the computation, as a signed word.
+    """
+    if comp.endswith('<<'):
+        return _WORD % ("(%s << 1)" % (x if comp[0] == 'D' else y))
+    if comp.endswith('>>'):
+        return "(%s >> 1)" % (x if comp[0] == 'D' else y)
+    expression = "".join(x if char == 'D' else y if char in 'AM' else
+                         " ~" if char == '!' else " %s " % char
+                         if char in '+-&|' else char for char in comp)
+    if '+' in comp or ('-' in comp and comp != '-1'):
+        return _WORD % ("(%s)" % expression.strip())
+    return "(%s)" % expression.strip()
+
+
+class JITEmulator(CPUEmulator):
+    """
+    A CPUEmulator that compiles the basic blocks of the program into Python
+    functions, so that hot loops run without dispatching every instruction.
+
+    A block is a run of instructions that starts at the address the program
+    counter jumps or falls to, and ends with the first jump, or just before
+    the next label of the program, so that blocks are not compiled again
+    from the middle of another block. Labels are recovered from the symbol
+    table of the assembler when the program is loaded from an .asm file.
+
+    Every block is interpreted the first COMPILE_THRESHOLD times it is
+    reached, and then compiled with compile() into a function from the RAM
+    and the A and D registers to the new A, D and program counter. The
+    functions are cached by the ROM address of their block until another
+    program is loaded, or poke_rom replaces one of their instructions.
+    Within a block, the value of A is known after an A-instruction, so
+    "@SP, AM=M-1" compiles to "ram[0] = a = ...". A block only runs if all
+    its instructions fit in the cycles left, the rest are interpreted, so
+    the emulator stays exact to the cycle.
+
+    Usage is the same as CPUEmulator's, and load_file recovers the labels:
+        emulator = JITEmulator()
+        emulator.load_file("Fill.asm")
+        emulator.run(10000000)
+    """
+
+    def load(self, program: typing.Sequence[int],
+             labels: typing.Iterable[int] = ()) -> None:
+        """Loads a program into the ROM and forgets the compiled blocks.
+
+        Args:
+            program (typing.Sequence[int]): the 16-bit instructions.
+            labels (typing.Iterable[int]): the ROM addresses of the labels
+                of the program, where blocks are split.
+        """
+        super().load(program)
+        self.labels = frozenset(labels)
+        self.blocks = [None] * ROM_SIZE
+        self.visits = [0] * ROM_SIZE
+        self.compiled = 0
+
+    def load_file(self, path: str) -> None:
+        """Loads a program, and the addresses of its labels if it is an
+        .asm file.
+
+        Args:
+            path (str): a .hack, .hackb or .asm file.
+        """
+        labels = ()
+        if os.path.splitext(path)[1].lower() == ".asm":
+            labels = label_addresses(path)
+        self.load(load_program(path), labels)
+
+    def poke_rom(self, address: int, word: int) -> None:
+        """Replaces a single instruction of the ROM, and forgets the
+        compiled blocks that contain it. The labels are kept.
+
+        Args:
+            address (int): the ROM address of the instruction.
+            word (int): the new 16-bit instruction.
+        """
+        super().poke_rom(address, word)
+        blocks = self.blocks
+        for start in range(max(address - MAX_BLOCK + 1, 0), address + 1):
+            block = blocks[start]
+            if block is not None and start + block[1] > address:
+                blocks[start] = None
+
+    def block_end(self, start: int) -> int:
+        """
+        Args:
+            start (int): the ROM address of the first instruction of a block.
+
+        Returns:
+            int: the ROM address that follows the last instruction of the
+            block.
+        """
+        rom = self.rom
+        labels = self.labels
+        end = start
+        limit = min(start + MAX_BLOCK, ROM_SIZE)
+        while end < limit:
+            word = rom[end]
+            end += 1
+            if (word >= 0x8000 and word & 7) or end in labels:
+                break
+        return end
+
+    def compile_block(self, start: int) -> typing.Tuple[
+            typing.Callable[[typing.Any, int, int],
+                            typing.Tuple[int, int, int]], int]:
+        """
+        Args:
+            start (int): the ROM address of the first instruction of a block.
+
+        Returns:
+            typing.Tuple[typing.Callable, int]: the compiled block, and its
+            number of instructions.
+        """
+        end = self.block_end(start)
+        namespace = {}
+        lines = []
+        # the Python expression of A: a literal after an A-instruction
+        a = "a"
+        exit_pc = str(end & 0x7FFF)
+        for address in range(start, end):
+            word = self.rom[address]
+            if word < 0x8000:
+                a = str(word)
+                continue
+            y = "ram[%s]" % a if word & 0x1000 else a
+            comp = _COMPS.get(word & 0xFFC0)
+            if comp is None:
+                # not a computation the assembler knows, see decode
+                name = "compute_%d" % address
+                namespace[name] = decode(word)[1][0]
+                value = "%s(d, %s)" % (name, y)
+            else:
+                value = _expression(comp, "d", y)
+            dest = _DESTS.get(word & 0x38, "")
+            jump = _JUMPS.get(word & 7)
+            target = a
+            if jump is not None and 'A' in dest and a == "a":
+                # the jump goes to the value A had before the instruction
+                lines.append("t = a")
+                target = "t"
+            if len(dest) > 1 or (dest and jump not in (None, 'JMP')):
+                lines.append("v = " + value)
+                value = "v"
+            if 'M' in dest:
+                lines.append("ram[%s] = %s" % (a, value))
+            if 'D' in dest:
+                lines.append("d = " + value)
+            if 'A' in dest:
+                lines.append("a = " + value)
+                a = "a"
+            if jump is not None:
+                target = str(int(target) & 0x7FFF) if target.isdigit() \
+                    else "%s & 0x7FFF" % target
+                if jump != 'JMP':
+                    exit_pc = "%s if %s %s else %d" % (
+                        target, value, _CONDITIONS[jump], end & 0x7FFF)
+                else:
+                    exit_pc = target
+        lines.append("return %s, d, %s" % (a, exit_pc))
+        source = "def block(ram, a, d):\n" + "".join(
+            "    %s\n" % line for line in lines)
+        exec(compile(source, "<block %d>" % start, "exec"), namespace)
+        self.compiled += 1
+        return namespace["block"], end - start
+
+    def execute(self, cycles: int) -> int:
+        """Executes instructions until the given number is executed or the
+        program counter runs past the end of the ROM, running the compiled
+        blocks where possible.
+
+        Args:
+            cycles (int): the number of instructions to execute.
+
+        Returns:
+            int: the number of instructions that are left to execute.
+        """
+        blocks = self.blocks
+        visits = self.visits
+        ram = self.ram
+        a, d, pc = self.a, self.d, self.pc
+        remaining = cycles
+        while remaining > 0:
+            block = blocks[pc]
+            if block is not None:
+                function, length = block
+                if length > remaining:
+                    break
+                a, d, pc = function(ram, a, d)
+                remaining -= length
+                self.cycles += length
+                continue
+            visits[pc] += 1
+            if visits[pc] >= COMPILE_THRESHOLD:
+                blocks[pc] = self.compile_block(pc)
+                continue
+            # a block never runs past the end of the ROM, so its
+            # instructions are all executed
+            length = min(self.block_end(pc) - pc, remaining)
+            self.a, self.d, self.pc = a, d, pc
+            super().execute(length)
+            a, d, pc = self.a, self.d, self.pc
+            remaining -= length
+        self.a, self.d, self.pc = a, d, pc
+        return super().execute(remaining) if remaining > 0 else 0
@@ -0,0 +1,293 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import os
+import re
+import typing
+from CPUEmulator import CPUEmulator
+
+# Comments, and the tokens of a script: quoted strings, words, "{", "}",
+# and the ",", ";" and "!" that end commands.
+_COMMENTS = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+_TOKENS = re.compile(r'"[^"]*"|[{},;!]|[^\s{},;!"]+')
+# A variable of an output-list, e.g. RAM[16384]%D2.6.2.
+_OUTPUT_VARIABLE = re.compile(
+    r"^(\w+)(?:\[(\d+)\])?(?:%([BDSX])(\d+)\.(\d+)\.(\d+))?$")
+_VARIABLE = re.compile(r"^(\w+)(?:\[(\d+)\])?$")
+
+
+class TestScript:
+    """
+    Runs a test script of the CPU emulator (a .tst file) on a CPUEmulator,
+    writes its output file and compares it with its compare file, line by
+    line. A "*" in the compare file matches any character.
+
+    The commands are those of the CPU emulator: load, output-file,
+    compare-to, output-list, set, repeat, while, tick, tock, ticktock,
+    output, echo and clear-echo. The variables are A, D, PC, time, RAM[i]
+    and ROM[i]. A tick does nothing and a tock executes an instruction, so
+    "ticktock" and "tick, tock" execute one. Consecutive ticktocks, as in
+    "repeat 1000000 { ticktock; }", are executed by a single run of the
+    emulator.
+
+    Usage:
+        script = TestScript("Mult.tst")
+        if not script.run():
+            print(script.message)
+    """
+
+    def __init__(self, path: str,
+                 emulator: typing.Optional[CPUEmulator] = None) -> None:
+        """
+        Args:
+            path (str): path of the .tst file. The files it names are
+                relative to its directory.
+            emulator (typing.Optional[CPUEmulator]): the emulator that runs
+                the script, e.g. a JITEmulator. A CPUEmulator by default.
+        """
+        self.path = path
+        self.directory = os.path.dirname(os.path.abspath(path))
+        with open(path, 'r') as script_file:
+            text = _COMMENTS.sub(" ", script_file.read())
+        self.tokens = _TOKENS.findall(text)
+        self.emulator = emulator if emulator is not None else CPUEmulator()
+        self.output_list = []
+        self.output_lines = []
+        self.compare_lines = None
+        self.output_path = None
+        self.message = ""
+        # instructions that are still to be executed before the next command
+        self.pending = 0
+
+    def run(self) -> bool:
+        """Runs the script.
+
+        Returns:
+            bool: False if an output line differs from its compare line, True
+            otherwise.
+        """
+        commands = self._parse(iter(self.tokens))
+        try:
+            passed = self._execute(commands)
+        finally:
+            if self.output_path is not None:
+                with open(self.output_path, 'w') as output_file:
+                    output_file.writelines(
+                        line + "\n" for line in self.output_lines)
+        if passed:
+            self.message = "End of script - Comparison ended successfully"
+        return passed
+
+    def _parse(self, tokens: typing.Iterator[str]) -> typing.List[typing.Any]:
+        """
+        Args:
+            tokens (typing.Iterator[str]): the remaining tokens.
+
+        Returns:
+            typing.List[typing.Any]: the commands up to the end of the
+            script or to the "}" of the current block. A command is a list
+            of words, a ("repeat", count, commands) or a ("while",
+            condition, commands) tuple.
+        """
+        commands = []
+        words = []
+        for token in tokens:
+            if token == "{":
+                # count is -1 for a repeat without a count, which is endless
+                if words[0] == "repeat":
+                    count = int(words[1]) if len(words) > 1 else -1
+                    commands.append(("repeat", count, self._parse(tokens)))
+                elif words[0] == "while":
+                    commands.append(("while", words[1:], self._parse(tokens)))
+                else:
+                    raise ValueError("%s: unexpected block after %s" %
+                                     (self.path, " ".join(words)))
+                words = []
+            elif token == "}":
+                break
+            elif token in (",", ";", "!"):
+                if words:
+                    commands.append(words)
+                words = []
+            else:
+                words.append(token)
+        if words:
+            commands.append(words)
+        return commands
+
+    def _execute(self, commands: typing.List[typing.Any]) -> bool:
+        """
+        Args:
+            commands (typing.List[typing.Any]): parsed commands.
+
+        Returns:
+            bool: False if the comparison failed.
+        """
+        for command in commands:
+            if isinstance(command, tuple):
+                kind, argument, body = command
+                if kind == "repeat" and argument >= 0 and all(
+                        words == ["ticktock"] for words in body):
+                    self.pending += argument * len(body)
+                    continue
+                iterations = 0
+                while (argument < 0 or iterations < argument) \
+                        if kind == "repeat" else self._condition(argument):
+                    if not self._execute(body):
+                        return False
+                    iterations += 1
+                continue
+            name = command[0]
+            if name in ("ticktock", "tock"):
+                self.pending += 1
+                continue
+            if name == "tick":
+                continue
+            self._flush()
+            if name == "load":
+                self._load(command[1:])
+            elif name == "output-file":
+                self.output_path = os.path.join(self.directory, command[1])
+            elif name == "compare-to":
+                with open(os.path.join(self.directory, command[1])) as \
+                        compare_file:
+                    self.compare_lines = compare_file.read().splitlines()
+            elif name == "output-list":
+                if not self._output_list(command[1:]):
+                    return False
+            elif name == "set":
+                self._set(command[1], int(command[2]))
+            elif name == "output":
+                if not self._output():
+                    return False
+            elif name in ("echo", "clear-echo", "breakpoint",
+                          "clear-breakpoints"):
+                continue
+            else:
+                raise ValueError("%s: %s is not a command of the CPU "
+                                 "emulator" % (self.path, name))
+        self._flush()
+        return True
+
+    def _flush(self) -> None:
+        """Executes the pending instructions."""
+        if self.pending:
+            self.emulator.run(self.pending)
+            self.pending = 0
+
+    def _load(self, arguments: typing.List[str]) -> None:
+        if not arguments or os.path.splitext(arguments[0])[1].lower() not in \
+                (".asm", ".hack", ".hackb"):
+            raise ValueError("%s: only programs (.asm, .hack or .hackb) can "
+                             "be loaded into the CPU emulator" % self.path)
+        self.emulator.load_file(os.path.join(self.directory, arguments[0]))
+        self.emulator.reset()
+
+    def _output_list(self, variables: typing.List[str]) -> bool:
+        self.output_list = []
+        header = []
+        for variable in variables:
+            match = _OUTPUT_VARIABLE.match(variable)
+            if match is None:
+                raise ValueError("%s: bad output variable %s" %
+                                 (self.path, variable))
+            name, index, kind, left, width, right = match.groups()
+            if kind is None:
+                kind, left, width, right = "B", "1", "16", "1"
+            column = (name, index, kind, int(left), int(width), int(right))
+            self.output_list.append(column)
+            title = name if index is None else "%s[%s]" % (name, index)
+            space = column[3] + column[4] + column[5]
+            title = title[:space]
+            before = (space - len(title)) // 2
+            header.append(" " * before + title +
+                          " " * (space - before - len(title)))
+        return self._write("|" + "|".join(header) + "|")
+
+    def _value(self, name: str, index: typing.Optional[str]) -> int:
+        emulator = self.emulator
+        if name == "RAM":
+            return emulator.ram[int(index)]
+        if name == "ROM":
+            return emulator.rom[int(index)]
+        if name == "A":
+            return emulator.a
+        if name == "D":
+            return emulator.d
+        if name == "PC":
+            return emulator.pc
+        if name == "time":
+            return emulator.cycles
+        raise ValueError("%s: unknown variable %s" % (self.path, name))
+
+    def _set(self, variable: str, value: int) -> None:
+        match = _VARIABLE.match(variable)
+        if match is None:
+            raise ValueError("%s: bad variable %s" % (self.path, variable))
+        name, index = match.groups()
+        # stored as a signed word, like the emulator's registers
+        value = ((value + 0x8000) & 0xFFFF) - 0x8000
+        emulator = self.emulator
+        if name == "RAM":
+            emulator.ram[int(index)] = value
+        elif name == "ROM":
+            emulator.poke_rom(int(index), value & 0xFFFF)
+        elif name == "A":
+            emulator.a = value
+        elif name == "D":
+            emulator.d = value
+        elif name == "PC":
+            emulator.pc = value & 0x7FFF
+        else:
+            raise ValueError("%s: unknown variable %s" % (self.path, name))
+
+    def _condition(self, words: typing.List[str]) -> bool:
+        self._flush()
+        variable, operator, operand = words
+        match = _VARIABLE.match(variable)
+        value = self._value(*match.groups())
+        operand = int(operand)
+        return {"=": value == operand, "<>": value != operand,
+                "<": value < operand, ">": value > operand,
+                "<=": value <= operand, ">=": value >= operand}[operator]
+
+    def _output(self) -> bool:
+        cells = []
+        for name, index, kind, left, width, right in self.output_list:
+            value = self._value(name, index)
+            if kind == "D":
+                text = str(value).rjust(width)[-width:]
+            elif kind == "X":
+                text = format(value & 0xFFFF, "04X").rjust(width)[-width:]
+            elif kind == "B":
+                text = format(value & 0xFFFF, "016b").rjust(width)[-width:]
+            else:
+                text = str(value).ljust(width)[:width]
+            cells.append(" " * left + text + " " * right)
+        return self._write("|" + "|".join(cells) + "|")
+
+    def _write(self, line: str) -> bool:
+        """Writes a line of output and compares it with its compare line.
+
+        Args:
+            line (str): a line of output.
+
+        Returns:
+            bool: False if the line differs from its compare line.
+        """
+        self.output_lines.append(line)
+        if self.compare_lines is None:
+            return True
+        number = len(self.output_lines)
+        expected = self.compare_lines[number - 1].rstrip() \
+            if number <= len(self.compare_lines) else ""
+        if len(expected) == len(line) and all(
+                wanted in ("*", actual)
+                for actual, wanted in zip(line, expected)):
+            return True
+        self.message = "Comparison failure at line %d" % number
+        return False
@@ -0,0 +1,232 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+Throughput benchmark of the assembler on synthetic Hack programs.
+
+Generates programs of increasing sizes, assembles each of them with every
+mode of the assembler, and reports the best end-to-end time and the time of
+every phase over a few repetitions. Results can be saved as JSON and
+compared against a previous run; a mode that got slower than the threshold
+fails the comparison.
+
+Usage:
+    python Benchmark.py --save baseline.json
+    # ... change the assembler ...
+    python Benchmark.py --compare baseline.json
+    python Benchmark.py --sizes 10000 10000000 --label-density 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import typing
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, "code"))
+from Code import COMP_TABLE, DEST_TABLE, JUMP_TABLE
+from Main import assemble_file, assemble_file_single_pass, assemble_stream
+from Profiler import Profiler
+
+DEFAULT_SIZES = [10 ** 4, 10 ** 5, 10 ** 6]
+# phases faster than this are too noisy to compare between runs
+MIN_COMPARED_SECONDS = 0.01
+MODES = {
+    'two_pass': assemble_file,
+    'single_pass': assemble_file_single_pass,
+    'stream': lambda input_file, output_file, profiler: assemble_stream(
+        input_file, output_file, profiler=profiler),
+}
+
+
+def generate_program(size: int, label_density: float = 0.05,
+                     variable_density: float = 0.3, variables: int = 1000,
+                     seed: int = 0) -> typing.Iterator[str]:
+    """Generates the lines of a synthetic Hack assembly program.
+
+    Half of the instructions are A-commands. Each of them refers to a
+    variable with probability variable_density, and otherwise to a label or
+    a constant. Each instruction is preceded by a new label with
+    probability label_density. Comments and indentation are sprinkled in so
+    the cleaning stage has work to do.
+
+    Args:
+        size (int): number of instructions.
+        label_density (float): probability of a label before an instruction.
+        variable_density (float): share of A-commands that use a variable.
+        variables (int): number of distinct variables.
+        seed (int): seed of the generator, the same seed gives the same
+            program.
+
+    Yields:
+        str: the lines of the program, with their newline.
+    """
+    generator = random.Random(seed)
+    labels = max(1, int(size * label_density))
+    comps = [comp for comp in COMP_TABLE if '<' not in comp and '>' not in comp]
+    dests = [dest for dest in DEST_TABLE if dest != 'null']
+    jumps = list(JUMP_TABLE)[1:]
+    defined = 0
+    yield "// synthetic program: %d instructions\n" % size
+    for _ in range(size):
+        if defined < labels and generator.random() < label_density:
+            yield "(LABEL_%d)\n" % defined
+            defined += 1
+        if generator.random() < 0.5:
+            kind = generator.random()
+            if kind < variable_density:
+                line = "@var_%d" % generator.randrange(variables)
+            elif kind < (1 + variable_density) / 2:
+                line = "@LABEL_%d" % generator.randrange(labels)
+            else:
+                line = "@%d" % generator.randrange(32768)
+        elif generator.random() < 0.8:
+            line = "%s=%s" % (generator.choice(dests),
+                              generator.choice(comps))
+        else:
+            line = "%s;%s" % (generator.choice(comps),
+                              generator.choice(jumps))
+        if generator.random() < 0.1:
+            line = "    " + line + "  // comment"
+        yield line + "\n"
+    # define the labels that no instruction happened to precede
+    for label in range(defined, labels):
+        yield "(LABEL_%d)\n" % label
+
+
+def run(sizes: typing.List[int], repeat: int, directory: str,
+        **generator_options) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Benchmarks every mode on a generated program of every size.
+
+    Args:
+        sizes (typing.List[int]): program sizes, in instructions.
+        repeat (int): runs per mode and size; the fastest run is kept.
+        directory (str): where the programs and outputs are written.
+        **generator_options: passed on to generate_program.
+
+    Returns:
+        typing.List[typing.Dict[str, typing.Any]]: a result per mode and
+        size, with the end-to-end seconds, the instructions per second and
+        the profiler report of the fastest run.
+    """
+    results = []
+    for size in sizes:
+        input_path = os.path.join(directory, "Synthetic%d.asm" % size)
+        output_path = os.path.join(directory, "Synthetic%d.hack" % size)
+        with open(input_path, 'w') as input_file:
+            input_file.writelines(generate_program(size, **generator_options))
+        for mode, assemble in MODES.items():
+            best = None
+            for _ in range(repeat):
+                profiler = Profiler()
+                start = time.perf_counter()
+                with open(input_path, 'r') as input_file, \
+                        open(output_path, 'w') as output_file:
+                    assemble(input_file, output_file, profiler)
+                seconds = time.perf_counter() - start
+                if best is None or seconds < best[0]:
+                    best = (seconds, profiler.report())
+            seconds, report = best
+            results.append({
+                'size': size, 'mode': mode, 'seconds': seconds,
+                'instructions_per_second': report['instructions'] / seconds,
+                'phases': {name: phase['seconds']
+                           for name, phase in report['phases'].items()}})
+            print("%-11s %9d instructions  %8.3fs  %10.0f instructions/s" % (
+                mode, size, seconds, report['instructions'] / seconds))
+        os.remove(input_path)
+        os.remove(output_path)
+    return results
+
+
+def compare(results: typing.List[typing.Dict[str, typing.Any]],
+            baseline: typing.List[typing.Dict[str, typing.Any]],
+            threshold: float) -> typing.List[str]:
+    """
+    Args:
+        results (typing.List[typing.Dict[str, typing.Any]]): this run.
+        baseline (typing.List[typing.Dict[str, typing.Any]]): a saved run.
+        threshold (float): allowed slowdown, 0.1 allows 10% more time.
+
+    Returns:
+        typing.List[str]: a description of every regression, end-to-end or
+        in a phase, of a mode and size that both runs measured. Timings
+        under MIN_COMPARED_SECONDS are not compared.
+    """
+    previous = {(result['size'], result['mode']): result
+                for result in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get((result['size'], result['mode']))
+        if old is None:
+            continue
+        timings = [('end-to-end', result['seconds'], old['seconds'])]
+        timings += [(name, seconds, old['phases'][name])
+                    for name, seconds in result['phases'].items()
+                    if name in old['phases']]
+        for name, seconds, old_seconds in timings:
+            if old_seconds >= MIN_COMPARED_SECONDS and \
+                    seconds > old_seconds * (1 + threshold):
+                regressions.append(
+                    "%s, %d instructions, %s: %.4fs -> %.4fs (+%.0f%%)" % (
+                        result['mode'], result['size'], name, old_seconds,
+                        seconds, 100 * (seconds / old_seconds - 1)))
+    return regressions
+
+
+if "__main__" == __name__:
+    argument_parser = argparse.ArgumentParser(
+        description="Benchmarks the assembler on synthetic programs.")
+    argument_parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+        help="program sizes in instructions (default: %(default)s)")
+    argument_parser.add_argument(
+        "--label-density", type=float, default=0.05,
+        help="probability of a label before an instruction")
+    argument_parser.add_argument(
+        "--variable-density", type=float, default=0.3,
+        help="share of A-commands that refer to a variable")
+    argument_parser.add_argument(
+        "--variables", type=int, default=1000,
+        help="number of distinct variables")
+    argument_parser.add_argument("--seed", type=int, default=0)
+    argument_parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="runs per mode and size, the fastest is kept")
+    argument_parser.add_argument(
+        "--save", metavar="FILE", help="write the results as JSON")
+    argument_parser.add_argument(
+        "--compare", metavar="FILE",
+        help="fail if slower than the JSON results of a previous run")
+    argument_parser.add_argument(
+        "--threshold", type=float, default=0.1,
+        help="allowed slowdown when comparing (default: %(default)s)")
+    arguments = argument_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = run(arguments.sizes, arguments.repeat, directory,
+                      label_density=arguments.label_density,
+                      variable_density=arguments.variable_density,
+                      variables=arguments.variables, seed=arguments.seed)
+    if arguments.save:
+        with open(arguments.save, 'w') as output_file:
+            json.dump({'python': platform.python_version(),
+                       'machine': platform.machine(),
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'options': vars(arguments),
+                       'results': results}, output_file, indent=2)
+    if arguments.compare:
+        with open(arguments.compare, 'r') as input_file:
+            baseline = json.load(input_file)['results']
+        regressions = compare(results, baseline, arguments.threshold)
+        for regression in regressions:
+            print("REGRESSION " + regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,220 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import concurrent.futures
+import io
+import json
+import os
+import socketserver
+import stat
+import sys
+import threading
+import typing
+from Main import assemble_path, assemble_words, error_message, format_hack
+from Profiler import Profiler
+
+# The options of assemble_path a request may set.
+PATH_OPTIONS = ('single_pass', 'binary', 'optimize', 'cache_directory',
+                'cache_size')
+
+
+def handle_request(request: typing.Dict[str, typing.Any]
+                   ) -> typing.Dict[str, typing.Any]:
+    """Serves a single request. This is the unit of work handed to the
+    workers of an AssemblerServer.
+
+    A request assembles either the file at "path", next to it, or the text
+    of "source", which is returned in the "hack" field of the response.
+    Requests for a path may also set the options of assemble_path, and any
+    request may set "optimize" and "profile". The "id" of the request, if
+    any, is copied to the response.
+
+    Args:
+        request (typing.Dict[str, typing.Any]): the decoded request.
+
+    Returns:
+        typing.Dict[str, typing.Any]: the response, whose "error" field is
+        set if the request failed.
+    """
+    response = {'id': request.get('id')}
+    profiler = Profiler()
+    try:
+        if 'path' in request:
+            options = {name: request[name] for name in PATH_OPTIONS
+                       if name in request}
+            response['output'] = assemble_path(
+                request['path'], profiler=profiler, **options)
+        elif 'source' in request:
+            words = assemble_words(io.StringIO(request['source']), profiler,
+                                   request.get('optimize', False))
+            response['hack'] = format_hack(words)
+        else:
+            raise ValueError("a request needs a path or a source")
+    except Exception as error:
+        response['error'] = error_message(error)
+        return response
+    if request.get('profile'):
+        response['profile'] = profiler.report()
+    return response
+
+
+class AssemblerServer:
+    """
+    Serves assembly requests from a long-running process, so the imports
+    and the tables of Code and SymbolTable are set up once and not for
+    every file. Requests and responses are JSON objects, one per line, read
+    from a stream (e.g. stdin) or from the connections of a Unix socket.
+
+    With more than one job, requests are handed to a pool of worker
+    processes that stay alive, and warm, between requests. Responses to the
+    requests of a stream are written as soon as they are ready, so they may
+    come out of order: match them by their "id".
+
+    Usage:
+        with AssemblerServer(jobs=4) as server:
+            server.serve_stream(sys.stdin, sys.stdout)
+    """
+
+    def __init__(self, jobs: int = 1) -> None:
+        """Starts the workers.
+
+        Args:
+            jobs (int): number of worker processes, 1 serves the requests
+                in this process, one at a time.
+        """
+        if jobs <= 1:
+            self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        else:
+            self.pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=jobs)
+        self.requests = 0
+
+    def __enter__(self) -> "AssemblerServer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Waits for the pending requests and stops the workers."""
+        self.pool.shutdown()
+
+    def submit(self, line: str) -> concurrent.futures.Future:
+        """
+        Args:
+            line (str): a request, as a line of JSON.
+
+        Returns:
+            concurrent.futures.Future: the future response, as a line of
+            JSON without its line break.
+        """
+        self.requests += 1
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("a request must be a JSON object")
+        except ValueError as error:
+            future = concurrent.futures.Future()
+            future.set_result(json.dumps(
+                {'id': None, 'error': error_message(error)}))
+            return future
+        response = concurrent.futures.Future()
+
+        def respond(done: concurrent.futures.Future) -> None:
+            try:
+                result = done.result()
+            except Exception as error:
+                # e.g. a worker process died
+                result = {'id': request.get('id'),
+                          'error': error_message(error)}
+            response.set_result(json.dumps(result))
+
+        self.pool.submit(handle_request, request).add_done_callback(respond)
+        return response
+
+    def serve_stream(self, input_stream: typing.TextIO,
+                     output_stream: typing.TextIO) -> None:
+        """Serves the requests of a stream until it ends.
+
+        Args:
+            input_stream (typing.TextIO): the requests, one per line.
+            output_stream (typing.TextIO): the responses, one per line.
+        """
+        lock = threading.Lock()
+        pending = []
+
+        def write(response: concurrent.futures.Future) -> None:
+            with lock:
+                output_stream.write(response.result() + "\n")
+                output_stream.flush()
+
+        for line in input_stream:
+            if line.strip():
+                response = self.submit(line)
+                response.add_done_callback(write)
+                pending.append(response)
+        concurrent.futures.wait(pending)
+
+    def serve_socket(self, socket_path: str) -> None:
+        """Serves the connections of a Unix socket until interrupted. Each
+        connection is a stream of requests, answered in order.
+
+        Args:
+            socket_path (str): path of the socket, which is replaced if it
+                already exists.
+
+        Raises:
+            FileExistsError: if something other than a socket exists at
+                socket_path.
+        """
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                for line in self.rfile:
+                    if line.strip():
+                        response = server.submit(line.decode()).result()
+                        self.wfile.write(response.encode() + b"\n")
+
+        try:
+            mode = os.lstat(socket_path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            if not stat.S_ISSOCK(mode):
+                raise FileExistsError(
+                    "%s exists and is not a socket" % socket_path)
+            os.unlink(socket_path)
+        with socketserver.ThreadingUnixStreamServer(
+                socket_path, Handler) as unix_server:
+            try:
+                unix_server.serve_forever()
+            finally:
+                os.unlink(socket_path)
+
+
+if "__main__" == __name__:
+    # Serves requests from stdin, or from a Unix socket if one is given.
+    argument_parser = argparse.ArgumentParser(prog="AssemblerServer")
+    argument_parser.add_argument(
+        "--socket", metavar="PATH",
+        help="serve the connections of a Unix socket instead of stdin")
+    argument_parser.add_argument(
+        "-j", "--jobs", type=int, default=1, metavar="N",
+        help="serve the requests with N worker processes")
+    arguments = argument_parser.parse_args()
+    with AssemblerServer(arguments.jobs) as assembler_server:
+        try:
+            if arguments.socket:
+                assembler_server.serve_socket(arguments.socket)
+            else:
+                assembler_server.serve_stream(sys.stdin, sys.stdout)
+        except KeyboardInterrupt:
+            pass
+        except FileExistsError as error:
+            argument_parser.error(str(error))
@@ -0,0 +1,130 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import hashlib
+import os
+import tempfile
+import typing
+
+DEFAULT_DIRECTORY = os.environ.get(
+    "HACK_ASSEMBLER_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "hack-assembler"))
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+ENTRY_SUFFIX = ".out"
+
+
+class BuildCache:
+    """
+    An on-disk cache of assembler outputs. Every entry is a file named by
+    the hash of what produced it: the source, the assembler version and the
+    output format. Reading an entry refreshes its modification time, and
+    once the entries outgrow the size cap the least recently used ones are
+    removed. Entries are written atomically, so several processes may share
+    one cache directory.
+
+    The size of the cache is measured once, by the first put, and then
+    estimated by adding the size of every entry written. The directory is
+    scanned again only when the estimate goes over the cap. Entries written
+    by other processes are only seen by that scan, so the cap is soft.
+    """
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY,
+                 max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """Opens the cache in the given directory, creating it if needed.
+
+        Args:
+            directory (str): where the entries are stored.
+            max_bytes (int): the total size the entries are trimmed to.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # estimated total size of the entries, None until first measured
+        self.total_bytes = None
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(source: bytes, version: str, output_format: str) -> str:
+        """
+        Args:
+            source (bytes): the contents of the source file.
+            version (str): identifies the assembler that built the output.
+            output_format (str): the kind of output, e.g. "hack".
+
+        Returns:
+            str: the key of the output built from the given source.
+        """
+        digest = hashlib.sha256()
+        digest.update(version.encode())
+        digest.update(b"\0" + output_format.encode() + b"\0")
+        digest.update(source)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        """
+        Args:
+            key (str): a key returned by key().
+
+        Returns:
+            typing.Optional[bytes]: the cached output, or None on a miss.
+        """
+        path = os.path.join(self.directory, key + ENTRY_SUFFIX)
+        try:
+            with open(path, 'rb') as entry:
+                output = entry.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return output
+
+    def put(self, key: str, output: bytes) -> None:
+        """Stores an output, then trims the cache to its size cap if it may
+        have outgrown it.
+
+        Args:
+            key (str): a key returned by key().
+            output (bytes): the output built for the key.
+        """
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as entry:
+                entry.write(output)
+            os.replace(temporary_path,
+                       os.path.join(self.directory, key + ENTRY_SUFFIX))
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+        if self.total_bytes is not None:
+            self.total_bytes += len(output)
+        if self.total_bytes is None or self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the total size of
+        the cache is at most max_bytes, and measures that size.
+        """
+        entries = []
+        total = 0
+        for directory_entry in os.scandir(self.directory):
+            if not directory_entry.name.endswith(ENTRY_SUFFIX):
+                continue
+            try:
+                status = directory_entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((status.st_mtime, status.st_size,
+                            directory_entry.path))
+            total += status.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.total_bytes = total
@@ -6,6 +6,56 @@ as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 
+DEST_TABLE = {'null': '000',
+              'M': '001',
+              'D': '010',
+              'MD': '011',
+              'A': '100',
+              'AM': '101',
+              'AD': '110',
+              'AMD': '111'}
+
+COMP_TABLE = {'0': '0101010', '1': '0111111', '-1': '0111010',
+              'D': '0001100', 'A': '0110000', 'D|A': '0010101',
+              '!D': '0001101', '!A': '0110001', '-D': '0001111',
+              '-A': '0110011', 'D+1': '0011111', 'A+1': '0110111',
+              'D-1': '0001110', 'A-1': '0110010', 'D+A': '0000010',
+              'D-A': '0010011', 'A-D': '0000111', 'D&A': '0000000',
+              'M': '1110000', '!M': '1110001', '-M': '1110011',
+              'M+1': '1110111', 'M-1': '1110010', 'D+M': '1000010',
+              'D-M': '1010011', 'M-D': '1000111', 'D&M': '1000000',
+              'D|M': '1010101', 'M<<': '1100000', 'M>>': '1000000',
+              'D<<': '0110000', 'D>>': '0010000', 'A<<': '0100000',
+              'A>>': '0000000'}
+# The VM translator writes some commutative computations with their operands
+# swapped, e.g. M=M+D, as the CPU emulator of the course accepts them. They
+# encode exactly like their canonical forms.
+COMP_TABLE.update({'A+D': COMP_TABLE['D+A'], 'M+D': COMP_TABLE['D+M'],
+                   'A&D': COMP_TABLE['D&A'], 'M&D': COMP_TABLE['D&M'],
+                   'A|D': COMP_TABLE['D|A'], 'M|D': COMP_TABLE['D|M']})
+
+JUMP_TABLE = {'null': '000',
+              'JGT': '001',
+              'JEQ': '010',
+              'JGE': '011',
+              'JLT': '100',
+              'JNE': '101',
+              'JLE': '110',
+              'JMP': '111'}
+
+# Integer encodings with every field already shifted into its place in the
+# 16-bit instruction, so an instruction is the OR of three lookups. A missing
+# dest or jump field (None) encodes as null. The comp entries carry the
+# instruction prefix: 111 for regular computations and 101 for shifts.
+DEST_BITS = {mnemonic: int(bits, 2) << 3
+             for mnemonic, bits in DEST_TABLE.items()}
+DEST_BITS[None] = 0
+JUMP_BITS = {mnemonic: int(bits, 2) for mnemonic, bits in JUMP_TABLE.items()}
+JUMP_BITS[None] = 0
+COMP_BITS = {mnemonic: (0b101 if '<<' in mnemonic or '>>' in mnemonic
+                        else 0b111) << 13 | int(bits, 2) << 6
+             for mnemonic, bits in COMP_TABLE.items()}
+
 
 class Code:
     """Translates Hack assembly language mnemonics into binary codes."""
@@ -21,17 +71,9 @@ class Code:
         Returns:
             str: 3-bit long binary code of the given mnemonic.
         """
-        dest_table = {'null': '000',
-                      'M': '001',
-                      'D': '010',
-                      'MD': '011',
-                      'A': '100',
-                      'AM': '101',
-                      'AD': '110',
-                      'AMD': '111'}
         if mnemonic:
-            return dest_table[mnemonic]
-        return dest_table['null']
+            return DEST_TABLE[mnemonic]
+        return DEST_TABLE['null']
 
     @staticmethod
     def comp(mnemonic: str) -> str:
@@ -42,20 +84,7 @@ class Code:
         Returns:
             str: the binary code of the given mnemonic.
         """
-
-        comp_table = {'0': '0101010', '1': '0111111', '-1': '0111010',
-                      'D': '0001100', 'A': '0110000', 'D|A': '0010101',
-                      '!D': '0001101', '!A': '010001', '-D': '0001111',
-                      '-A': '0110011', 'D+1': '0011111', 'A+1': '0110111',
-                      'D-1': '0001110', 'A-1': '0110010', 'D+A': '0000010',
-                      'D-A': '0010011', 'A-D': '0000111', 'D&A': '0000000',
-                      'M': '1110000', '!M': '1110001', '-M': '1110011',
-                      'M+1': '1110111', 'M-1': '1110010', 'D+M': '1000010',
-                      'D-M': '1010011', 'M-D': '1000111', 'D&M': '1000000',
-                      'D|M': '1010101', 'M<<': '1100000', 'M>>': '1000000',
-                      'D<<': '0110000', 'D>>': '0010000', 'A<<': '0100000',
-                      'A>>': '0000000'}
-        return comp_table[mnemonic]
+        return COMP_TABLE[mnemonic]
 
     @staticmethod
     def jump(mnemonic: str) -> str:
@@ -66,15 +95,19 @@ class Code:
         Returns:
             str: 3-bit long binary code of the given mnemonic.
         """
-        jump_dict = {'null': '000',
-                     'JGT': '001',
-                     'JEQ': '010',
-                     'JGE': '011',
-                     'JLT': '100',
-                     'JNE': '101',
-                     'JLE': '110',
-                     'JMP': '111'}
-
         if mnemonic:
-            return jump_dict[mnemonic]
-        return jump_dict['null']
+            return JUMP_TABLE[mnemonic]
+        return JUMP_TABLE['null']
+
+    @staticmethod
+    def instruction(comp: str, dest: str, jump: str) -> int:
+        """
+        Args:
+            comp (str): a comp mnemonic string.
+            dest (str): a dest mnemonic string, or None.
+            jump (str): a jump mnemonic string, or None.
+
+        Returns:
+            int: the 16-bit code of the C-instruction, including its prefix.
+        """
+        return COMP_BITS[comp] | DEST_BITS[dest] | JUMP_BITS[jump]
@@ -0,0 +1,49 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+The decoded assembly commands. They have a module of their own because the
+VM translator has a Parser module too, which shadows the assembler's when
+both directories are on the path.
+"""
+import sys
+
+
+class Command:
+    """A single assembly command, decoded once from its source line."""
+
+    __slots__ = ('type', 'symbol', 'dest', 'comp', 'jump')
+
+    def __init__(self, type: str, symbol: str = None, dest: str = None,
+                 comp: str = None, jump: str = None) -> None:
+        self.type = type
+        self.symbol = symbol
+        self.dest = dest
+        self.comp = comp
+        self.jump = jump
+
+
+def decode_line(line: str) -> Command:
+    """Splits a clean command line into its fields.
+
+    Args:
+        line (str): a command line, without white space and comments.
+
+    Returns:
+        Command: the decoded command.
+    """
+    first_elem = line[0]
+    if first_elem == '@':
+        return Command('A_COMMAND', sys.intern(line[1:]))
+    if first_elem == '(':
+        return Command('L_COMMAND', sys.intern(line[1:-1]))
+    dest, equal, comp = line.partition('=')
+    if not equal:
+        dest, comp = None, dest
+    comp, semicolon, jump = comp.partition(';')
+    if not semicolon:
+        jump = None
+    return Command('C_COMMAND', None, dest, comp, jump)
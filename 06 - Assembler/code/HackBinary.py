@@ -0,0 +1,102 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import array
+import mmap
+import struct
+import sys
+import typing
+
+# A .hackb file is a 12-byte header followed by the program as an array of
+# little-endian unsigned 16-bit words:
+#   magic (4 bytes) | version (uint16) | flags (uint16) | word count (uint32)
+MAGIC = b'HACK'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI')
+
+
+def format_hack(words: typing.List[int]) -> str:
+    """
+    Args:
+        words (typing.List[int]): the 16-bit instructions of the program.
+
+    Returns:
+        str: the program in the textual .hack format.
+    """
+    if not words:
+        return ''
+    return '\n'.join([format(word, '016b') for word in words]) + '\n'
+
+
+def write_hackb(words: typing.Sequence[int],
+                output_file: typing.BinaryIO) -> None:
+    """Writes machine words as a packed .hackb file.
+
+    Args:
+        words (typing.Sequence[int]): the 16-bit instructions of the program.
+        output_file (typing.BinaryIO): a file opened for binary writing.
+    """
+    write_hackb_header(len(words), output_file)
+    output_file.write(pack_words(words))
+
+
+def write_hackb_header(count: int, output_file: typing.BinaryIO) -> None:
+    """Writes the header of a .hackb file, to be followed by exactly count
+    words written with pack_words.
+
+    Args:
+        count (int): the number of words in the program.
+        output_file (typing.BinaryIO): a file opened for binary writing.
+    """
+    output_file.write(HEADER.pack(MAGIC, VERSION, 0, count))
+
+
+def pack_words(words: typing.Sequence[int]) -> bytes:
+    """
+    Args:
+        words (typing.Sequence[int]): 16-bit instructions.
+
+    Returns:
+        bytes: the words as little-endian uint16 values.
+    """
+    packed = array.array('H', words)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def load_hackb(path: str) -> typing.Union[memoryview, array.array]:
+    """Maps a .hackb file into memory.
+
+    On little-endian hosts the words are returned as a read-only memoryview
+    of format 'H' over the mapping, so nothing is copied. On big-endian
+    hosts the words have to be swapped, and an array('H') copy is returned.
+
+    Args:
+        path (str): path of the .hackb file.
+
+    Returns:
+        typing.Union[memoryview, array.array]: the 16-bit instructions.
+    """
+    with open(path, 'rb') as input_file:
+        input_file.seek(0, 2)
+        if input_file.tell() < HEADER.size:
+            raise ValueError("%s: not a .hackb file" % path)
+        # the mapping stays valid after the file object is closed
+        mapping = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, _, count = HEADER.unpack_from(mapping)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("%s: not a version %d .hackb file" % (path, VERSION))
+    end = HEADER.size + 2 * count
+    if end > len(mapping):
+        raise ValueError("%s: truncated .hackb file" % path)
+    data = memoryview(mapping)[HEADER.size:end]
+    if sys.byteorder == 'little':
+        return data.cast('H')
+    words = array.array('H', data)
+    words.byteswap()
+    return words
@@ -0,0 +1,222 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import bisect
+import typing
+from SymbolTable import SymbolTable
+from Command import Command
+from Parser import clean_source, decode_line
+from Code import Code
+from Profiler import Profiler
+from Passes import encode_commands, first_pass
+
+# Number of lines compared at once when looking for the unchanged prefix
+# and suffix of two versions of a program.
+_COMPARE_CHUNK = 1024
+
+
+def _common_prefix(old: typing.List[str], new: typing.List[str]) -> int:
+    """
+    Args:
+        old (typing.List[str]): a sequence of lines.
+        new (typing.List[str]): another sequence of lines.
+
+    Returns:
+        int: the number of leading lines the two sequences share.
+    """
+    limit = min(len(old), len(new))
+    index = 0
+    # whole chunks are compared by the list comparison, in C
+    while index + _COMPARE_CHUNK <= limit and \
+            old[index:index + _COMPARE_CHUNK] == \
+            new[index:index + _COMPARE_CHUNK]:
+        index += _COMPARE_CHUNK
+    while index < limit and old[index] == new[index]:
+        index += 1
+    return index
+
+
+def _common_suffix(old: typing.List[str], new: typing.List[str],
+                   prefix: int) -> int:
+    """
+    Args:
+        old (typing.List[str]): a sequence of lines.
+        new (typing.List[str]): another sequence of lines.
+        prefix (int): the length of their common prefix, which the suffix
+            may not overlap.
+
+    Returns:
+        int: the number of trailing lines the two sequences share.
+    """
+    limit = min(len(old), len(new)) - prefix
+    old_end, new_end = len(old), len(new)
+    suffix = 0
+    while suffix + _COMPARE_CHUNK <= limit and \
+            old[old_end - suffix - _COMPARE_CHUNK:old_end - suffix] == \
+            new[new_end - suffix - _COMPARE_CHUNK:new_end - suffix]:
+        suffix += _COMPARE_CHUNK
+    while suffix < limit and \
+            old[old_end - suffix - 1] == new[new_end - suffix - 1]:
+        suffix += 1
+    return suffix
+
+
+class IncrementalAssembler:
+    """
+    Re-assembles successive versions of one program, re-encoding only the
+    lines that changed since the previous version.
+
+    The command lines of the previous version are kept, together with its
+    symbol table and its encoded instructions. A new version is compared
+    with the previous one to find the single region of lines between their
+    common prefix and common suffix, and only that region is decoded and
+    encoded. The instructions after the region move when the number of its
+    instructions changes, which is only a problem for the labels, so the
+    whole program is rebuilt instead when the edit could move any symbol:
+    - the region defines a label in either version.
+    - the number of instructions of the region changed and a label follows
+      it, as that label moves.
+    - the region references a variable that is not allocated yet, or is
+      where a variable was first referenced, so variables move.
+
+    The instructions are always identical to those of assemble_words. The
+    lookups and misses of the statistics of the symbol table are counted
+    for each version, its labels and variables are those of the program.
+
+    Usage:
+        assembler = IncrementalAssembler()
+        words = assembler.assemble(source)
+        words = assembler.assemble(edited_source)
+    """
+
+    def __init__(self) -> None:
+        """Creates an assembler with no previous version."""
+        self.lines = None
+        # indices of the lines that define labels, in increasing order
+        self.label_lines = None
+        self.words = None
+        self.symbol_table = None
+        # variable -> ROM address of the instruction that allocated it
+        self.first_use = None
+        self.rebuilds = 0
+        self.reencoded = 0
+
+    def assemble(self, source: str,
+                 profiler: Profiler = None) -> typing.List[int]:
+        """Assembles a version of the program.
+
+        Args:
+            source (str): the text of the program.
+            profiler (Profiler): records the cleaning, diffing and either the
+                encoding or the rebuilding phases, if given. Its
+                "incremental" counter tells whether a rebuild was avoided.
+
+        Returns:
+            typing.List[int]: the 16-bit instructions of the program. The
+            list is owned by the assembler and updated in place by the next
+            call, copy it to keep it.
+        """
+        profiler = profiler or Profiler()
+        with profiler.phase('cleaning'):
+            lines = clean_source(source)
+        incremental = False
+        if self.lines is not None:
+            self.symbol_table.reset_lookups()
+            with profiler.phase('diffing'):
+                prefix = _common_prefix(self.lines, lines)
+                suffix = _common_suffix(self.lines, lines, prefix)
+                old_region = self.lines[prefix:len(self.lines) - suffix]
+                new_region = [decode_line(line)
+                              for line in lines[prefix:len(lines) - suffix]]
+            with profiler.phase('encoding'):
+                incremental = self._reencode(prefix, old_region, new_region)
+        if incremental:
+            self.lines = lines
+        else:
+            with profiler.phase('rebuilding'):
+                self._rebuild(lines)
+        profiler.instructions += len(self.words)
+        profiler.counters['incremental'] = incremental
+        profiler.counters.update(self.symbol_table.statistics())
+        return self.words
+
+    def _rebuild(self, lines: typing.List[str]) -> None:
+        """Assembles the whole program, like assemble_words, and records the
+        state the next version is compared with.
+
+        Args:
+            lines (typing.List[str]): the clean command lines of the program.
+        """
+        commands = [decode_line(line) for line in lines]
+        symbol_table = SymbolTable()
+        first_pass(commands, symbol_table)
+        first_use = {}
+        words = list(encode_commands(commands, symbol_table, Code(),
+                                     first_use.__setitem__))
+        self.lines = lines
+        self.label_lines = [index for index, command in enumerate(commands)
+                            if command.type == 'L_COMMAND']
+        self.words = words
+        self.symbol_table = symbol_table
+        self.first_use = first_use
+        self.rebuilds += 1
+
+    def _reencode(self, start: int, old_region: typing.List[str],
+                  new_region: typing.List[Command]) -> bool:
+        """Replaces the instructions of a changed region in place, if that
+        does not move any label or variable.
+
+        Args:
+            start (int): index of the first line of the region.
+            old_region (typing.List[str]): the previous lines of the region.
+            new_region (typing.List[Command]): the new commands of the region.
+
+        Returns:
+            bool: True if the region was re-encoded, False if the program
+            must be rebuilt.
+        """
+        if any(line[0] == '(' for line in old_region) or \
+                any(command.type == 'L_COMMAND' for command in new_region):
+            return False
+        # without labels in the region, every line is one instruction and
+        # the lines before it are the same, so its ROM address is fixed
+        labels_before = bisect.bisect_left(self.label_lines, start)
+        if len(old_region) != len(new_region) and \
+                labels_before < len(self.label_lines):
+            return False
+        rom_address = start - labels_before
+        end_address = rom_address + len(old_region)
+        for address in self.first_use.values():
+            if rom_address <= address < end_address:
+                return False
+        symbol_table = self.symbol_table
+        code = Code()
+        encoded = []
+        for command in new_region:
+            if command.type == 'A_COMMAND':
+                symbol = command.symbol
+                if symbol.isnumeric():
+                    encoded.append(int(symbol))
+                    continue
+                address = symbol_table.lookup(symbol)
+                if address is None or \
+                        self.first_use.get(symbol, -1) >= rom_address:
+                    return False
+                encoded.append(address)
+            else:
+                encoded.append(code.instruction(
+                    command.comp, command.dest, command.jump))
+        self.words[rom_address:end_address] = encoded
+        shift = len(new_region) - len(old_region)
+        if shift:
+            # only the variables first referenced after the region move
+            first_use = self.first_use
+            for symbol, address in first_use.items():
+                if address >= end_address:
+                    first_use[symbol] = address + shift
+        self.reencoded += len(encoded)
+        return True
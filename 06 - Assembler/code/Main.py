@@ -5,85 +5,626 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import concurrent.futures
+import functools
+import hashlib
+import io
+import json
 import os
 import sys
+import time
 import typing
 from SymbolTable import SymbolTable
-from Parser import Parser
+from Command import Command
+from Parser import clean_source, decode_line, stream_commands
 from Code import Code
+from Optimizer import Optimizer
+from HackBinary import format_hack, pack_words, write_hackb, \
+    write_hackb_header
+from BuildCache import BuildCache, DEFAULT_DIRECTORY, DEFAULT_MAX_BYTES
+from Profiler import Profiler
+from Passes import encode_commands, first_pass, resolve_symbol
+from IncrementalAssembler import IncrementalAssembler
+
+STREAM_CHUNK_SIZE = 1 << 16
+
+# (directory, size cap) -> the BuildCache opened in this process, or None
+# once the directory turned out to be unusable.
+_caches = {}
 
 
 def assemble_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+        input_file: typing.TextIO, output_file: typing.TextIO,
+        profiler: Profiler = None, optimize: bool = False) -> None:
     """Assembles a single file.
 
     Args:
         input_file (typing.TextIO): the file to assemble.
         output_file (typing.TextIO): writes all output to this file.
+        profiler (Profiler): records the phases of the assembly, if given.
+        optimize (bool): run the peephole Optimizer before encoding.
     """
-    # A good place to start is to initialize a new Parser object:
-    # parser = Parser(input_file)
-    # Note that you can write to output_file like so:
-    # output_file.write("Hello world! \n")
+    profiler = profiler or Profiler()
+    words = assemble_words(input_file, profiler, optimize)
+    with profiler.phase('writing'):
+        write_hack(words, output_file)
+
+
+def assemble_file_single_pass(
+        input_file: typing.TextIO, output_file: typing.TextIO,
+        profiler: Profiler = None, optimize: bool = False) -> None:
+    """Assembles a single file with one pass over its commands, see
+    assemble_words_single_pass.
 
-    rom_address = 0
-    parser = Parser(input_file)
+    Args:
+        input_file (typing.TextIO): the file to assemble.
+        output_file (typing.TextIO): writes all output to this file.
+        profiler (Profiler): records the phases of the assembly, if given.
+        optimize (bool): run the peephole Optimizer before encoding.
+    """
+    profiler = profiler or Profiler()
+    words = assemble_words_single_pass(input_file, profiler, optimize)
+    with profiler.phase('writing'):
+        write_hack(words, output_file)
+
+
+def assemble_words(input_file: typing.TextIO,
+                   profiler: Profiler = None,
+                   optimize: bool = False) -> typing.List[int]:
+    """Assembles a single file in two passes: the first collects the labels,
+    the second encodes the instructions.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble.
+        profiler (Profiler): records the reading, cleaning, optimizing,
+            first_pass and second_pass phases, if given.
+        optimize (bool): run the peephole Optimizer before encoding.
+
+    Returns:
+        typing.List[int]: the 16-bit instructions of the program.
+    """
+    profiler = profiler or Profiler()
+    with profiler.phase('reading'):
+        source = input_file.read()
+    return assemble_source(source, profiler, optimize)
+
+
+def assemble_source(source: str, profiler: Profiler = None,
+                    optimize: bool = False) -> typing.List[int]:
+    """Assembles a program that is already read, like assemble_words.
+
+    Args:
+        source (str): the text of the program.
+        profiler (Profiler): records the cleaning, optimizing, first_pass
+            and second_pass phases, if given.
+        optimize (bool): run the peephole Optimizer before encoding.
+
+    Returns:
+        typing.List[int]: the 16-bit instructions of the program.
+    """
+    profiler = profiler or Profiler()
+    with profiler.phase('cleaning'):
+        commands = [decode_line(line) for line in clean_source(source)]
+    if optimize:
+        commands = optimize_commands(commands, profiler)
     symbol_table = SymbolTable()
     code = Code()
-    #first pass
-    while parser.has_more_commands():
-        if parser.command_type() == 'L_COMMAND':
-            symbol_table.add_entry(parser.symbol(), rom_address)
-        else:
-            rom_address += 1
-        parser.advance()
-
-    #second pass
-    parser.cur_index = 0
-    ram_address = 16
-    while parser.has_more_commands():
-        if parser.command_type() == 'A_COMMAND':
-            if parser.symbol().isnumeric():
-                binary = '{0:016b}'.format(int(parser.symbol()))
-            elif symbol_table.contains(parser.symbol()):
-                binary = '{0:016b}'.format(symbol_table.get_address(parser.symbol()))
-                # ram_address += 1
-            else:
-                symbol_table.add_entry(parser.symbol(), ram_address)
-                binary = '{0:016b}'.format(ram_address)
-                ram_address += 1
-            output_file.write(binary+'\n')
-        elif parser.command_type() == 'C_COMMAND':
-            comp = code.comp(parser.comp())
-            dest = code.dest(parser.dest())
-            jump = code.jump(parser.jump())
-            if '<<' in parser.command_lines[parser.cur_index] or '>>' in parser.command_lines[parser.cur_index]:
-                output_file.write('101'+comp+dest+jump+'\n')
+    with profiler.phase('first_pass'):
+        first_pass(commands, symbol_table)
+    with profiler.phase('second_pass'):
+        words = list(encode_commands(commands, symbol_table, code))
+    profiler.instructions += len(words)
+    profiler.counters.update(symbol_table.statistics())
+    return words
+
+
+def assemble_words_single_pass(
+        input_file: typing.TextIO, profiler: Profiler = None,
+        optimize: bool = False) -> typing.List[int]:
+    """Assembles a single file with one pass over its commands.
+
+    Instructions are emitted into a buffer preallocated to the number of
+    command lines. Symbolic A-commands are left as holes and backpatched
+    once every label is known, so the result is identical to the result of
+    assemble_words.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble.
+        profiler (Profiler): records the reading, cleaning, optimizing,
+            single_pass and backpatching phases, if given.
+        optimize (bool): run the peephole Optimizer before encoding.
+
+    Returns:
+        typing.List[int]: the 16-bit instructions of the program.
+    """
+    profiler = profiler or Profiler()
+    with profiler.phase('reading'):
+        source = input_file.read()
+    return assemble_source_single_pass(source, profiler, optimize)
+
+
+def assemble_source_single_pass(
+        source: str, profiler: Profiler = None,
+        optimize: bool = False) -> typing.List[int]:
+    """Assembles a program that is already read, like
+    assemble_words_single_pass.
+
+    Args:
+        source (str): the text of the program.
+        profiler (Profiler): records the cleaning, optimizing, single_pass
+            and backpatching phases, if given.
+        optimize (bool): run the peephole Optimizer before encoding.
+
+    Returns:
+        typing.List[int]: the 16-bit instructions of the program.
+    """
+    profiler = profiler or Profiler()
+    with profiler.phase('cleaning'):
+        commands = [decode_line(line) for line in clean_source(source)]
+    if optimize:
+        commands = optimize_commands(commands, profiler)
+    symbol_table = SymbolTable()
+    code = Code()
+    with profiler.phase('single_pass'):
+        buffer = [0] * len(commands)
+        # symbol -> ROM addresses referencing it, in order of first use
+        holes = {}
+        rom_address = 0
+        for command in commands:
+            if command.type == 'L_COMMAND':
+                symbol_table.add_entry(command.symbol, rom_address)
+                continue
+            if command.type == 'A_COMMAND':
+                symbol = command.symbol
+                if symbol.isnumeric():
+                    buffer[rom_address] = int(symbol)
+                elif symbol in holes:
+                    holes[symbol].append(rom_address)
+                else:
+                    holes[symbol] = [rom_address]
             else:
-                output_file.write('111'+comp+dest+jump+'\n')
-        parser.advance()
+                buffer[rom_address] = code.instruction(
+                    command.comp, command.dest, command.jump)
+            rom_address += 1
+
+    # backpatch: variables are allocated in order of first use, exactly as
+    # the second pass of assemble_words does
+    with profiler.phase('backpatching'):
+        for symbol, addresses in holes.items():
+            value = resolve_symbol(symbol_table, symbol)
+            for address in addresses:
+                buffer[address] = value
+        del buffer[rom_address:]
+    profiler.instructions += len(buffer)
+    profiler.counters.update(symbol_table.statistics())
+    return buffer
+
+
+def assemble_stream(input_file: typing.TextIO, output_file: typing.IO,
+                    binary: bool = False,
+                    chunk_size: int = STREAM_CHUNK_SIZE,
+                    profiler: Profiler = None) -> None:
+    """Assembles a file of any size while holding only the symbol table and
+    a chunk of input and output in memory.
+
+    The first pass streams the input to collect the labels, then the input
+    is rewound and streamed again to encode and write the instructions. The
+    input must therefore be seekable. The output is identical to the output
+    of assemble_words written with write_hack or write_hackb.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble.
+        output_file (typing.IO): writes all output to this file, which is
+            opened for binary writing if binary is True.
+        binary (bool): write the packed .hackb format.
+        chunk_size (int): number of characters read, and about the number of
+            instructions written, at a time.
+        profiler (Profiler): records the first_pass and second_pass phases,
+            if given. Reading, cleaning and writing are interleaved with the
+            passes and counted in them.
+    """
+    profiler = profiler or Profiler()
+    symbol_table = SymbolTable()
+    code = Code()
+    start = input_file.tell()
+    with profiler.phase('first_pass'):
+        rom_address = first_pass(
+            stream_commands(input_file, chunk_size), symbol_table)
+    with profiler.phase('second_pass'):
+        input_file.seek(start)
+        if binary:
+            write_hackb_header(rom_address, output_file)
+            encode = pack_words
+        else:
+            encode = format_hack
+        words = []
+        for word in encode_commands(stream_commands(input_file, chunk_size),
+                                    symbol_table, code):
+            words.append(word)
+            if len(words) >= chunk_size:
+                output_file.write(encode(words))
+                words = []
+        if words:
+            output_file.write(encode(words))
+    profiler.instructions += rom_address
+    profiler.counters.update(symbol_table.statistics())
+
+
+def optimize_commands(commands: typing.List[Command],
+                      profiler: Profiler = None) -> typing.List[Command]:
+    """Runs the peephole Optimizer over decoded commands.
+
+    Args:
+        commands (typing.List[Command]): the decoded commands of a program.
+        profiler (Profiler): records the optimizing phase and the number of
+            removed commands, if given.
+
+    Returns:
+        typing.List[Command]: the optimized commands.
+    """
+    profiler = profiler or Profiler()
+    optimizer = Optimizer()
+    with profiler.phase('optimizing'):
+        commands = optimizer.optimize(commands)
+    profiler.counters['optimized_away'] = optimizer.removed
+    return commands
+
+
+def write_hack(words: typing.List[int], output_file: typing.TextIO) -> None:
+    """Writes machine words as the textual .hack format, in a single write.
+
+    Args:
+        words (typing.List[int]): the 16-bit instructions of the program.
+        output_file (typing.TextIO): writes all output to this file.
+    """
+    output_file.write(format_hack(words))
+
+
+@functools.lru_cache(maxsize=None)
+def assembler_version() -> str:
+    """
+    Returns:
+        str: a hash of the assembler's source files. Cached outputs are keyed
+        by it, so any change to the assembler invalidates them.
+    """
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".py"):
+            with open(os.path.join(directory, filename), 'rb') as source:
+                digest.update(filename.encode() + b"\0" + source.read())
+    return digest.hexdigest()
+
+
+def assemble_path(input_path: str, single_pass: bool = False,
+                  binary: bool = False, stream: bool = False,
+                  cache_directory: str = None,
+                  cache_size: int = DEFAULT_MAX_BYTES,
+                  profiler: Profiler = None, optimize: bool = False) -> str:
+    """Assembles the .asm file at input_path next to it, as .hack or .hackb.
+    This is the unit of work handed to worker processes by assemble_paths.
+
+    With a cache directory, the output is looked up by the hash of the
+    source before assembling, and an output file that is already up to date
+    is left untouched. A cache directory that cannot be used is skipped with
+    a warning, and the file is assembled as if there were no cache.
+    Streaming bypasses the cache, as the cache needs the whole source and
+    output in memory. For the same reason streaming cannot be optimized, as
+    the optimizer looks ahead past labels.
+
+    Args:
+        input_path (str): path of the file to assemble.
+        single_pass (bool): use assemble_words_single_pass.
+        binary (bool): write a packed .hackb file instead of a .hack file.
+        stream (bool): use assemble_stream.
+        cache_directory (str): directory of the BuildCache, None disables it.
+        cache_size (int): size cap of the cache, in bytes.
+        profiler (Profiler): records the phases of the assembly, if given.
+            Its "cache_hit" counter tells whether the cache was used.
+        optimize (bool): run the peephole Optimizer before encoding.
+
+    Returns:
+        str: the path of the written file.
+    """
+    profiler = profiler or Profiler()
+    output_format = "hackb" if binary else "hack"
+    output_path = os.path.splitext(input_path)[0] + "." + output_format
+    if stream:
+        if optimize:
+            raise ValueError("streaming cannot be combined with optimization")
+        with open(input_path, 'r') as input_file, \
+                open(output_path, 'wb' if binary else 'w') as output_file:
+            assemble_stream(input_file, output_file, binary,
+                            profiler=profiler)
+        return output_path
+    with profiler.phase('reading'):
+        with open(input_path, 'rb') as input_file:
+            source = input_file.read()
+    cache = None
+    if cache_directory is not None:
+        cache = open_cache(cache_directory, cache_size)
+    if cache is not None:
+        key = cache.key(source, assembler_version(),
+                        output_format + ("-O" if optimize else ""))
+        try:
+            output = cache.get(key)
+        except OSError as error:
+            _disable_cache(cache_directory, cache_size, error)
+            cache = output = None
+        profiler.counters['cache_hit'] = output is not None
+        if output is not None:
+            with profiler.phase('writing'):
+                if not _is_up_to_date(output_path, output):
+                    with open(output_path, 'wb') as output_file:
+                        output_file.write(output)
+            return output_path
+
+    assemble = assemble_source_single_pass if single_pass \
+        else assemble_source
+    words = assemble(source.decode(), profiler, optimize)
+    with profiler.phase('writing'):
+        if binary:
+            output_stream = io.BytesIO()
+            write_hackb(words, output_stream)
+            output = output_stream.getvalue()
+        else:
+            output = format_hack(words).encode()
+        with open(output_path, 'wb') as output_file:
+            output_file.write(output)
+    if cache is not None:
+        try:
+            cache.put(key, output)
+        except OSError as error:
+            _disable_cache(cache_directory, cache_size, error)
+    return output_path
+
+
+def open_cache(directory: str,
+               max_bytes: int) -> typing.Optional[BuildCache]:
+    """Opens a BuildCache once per process, so its size estimate is kept
+    across files.
+
+    Args:
+        directory (str): directory of the cache.
+        max_bytes (int): size cap of the cache, in bytes.
+
+    Returns:
+        typing.Optional[BuildCache]: the cache, or None if the directory
+        cannot be used, in which case files are assembled without it.
+    """
+    if (directory, max_bytes) not in _caches:
+        try:
+            _caches[directory, max_bytes] = BuildCache(directory, max_bytes)
+        except OSError as error:
+            _disable_cache(directory, max_bytes, error)
+    return _caches[directory, max_bytes]
+
+
+def _disable_cache(directory: str, max_bytes: int, error: OSError) -> None:
+    """Stops using a cache directory for the rest of the process, and warns
+    about it once.
+
+    Args:
+        directory (str): directory of the cache.
+        max_bytes (int): size cap of the cache, in bytes.
+        error (OSError): why the cache cannot be used.
+    """
+    if _caches.get((directory, max_bytes), True) is not None:
+        print("warning: build cache disabled, %s" % error_message(error),
+              file=sys.stderr)
+    _caches[directory, max_bytes] = None
+
+
+def watch_paths(input_paths: typing.List[str], binary: bool = False,
+                interval: float = 0.5) -> None:
+    """Assembles files whenever they change, until interrupted. Each file
+    keeps an IncrementalAssembler, so a small edit to a large file only
+    re-encodes the edited lines.
+
+    Args:
+        input_paths (typing.List[str]): paths of the files to watch.
+        binary (bool): write packed .hackb files instead of .hack files.
+        interval (float): seconds between checks of the modification times.
+    """
+    assemblers = {input_path: IncrementalAssembler()
+                  for input_path in input_paths}
+    modified = {}
+    while True:
+        for input_path, assembler in assemblers.items():
+            try:
+                mtime = os.stat(input_path).st_mtime_ns
+                if modified.get(input_path) == mtime:
+                    continue
+                modified[input_path] = mtime
+                with open(input_path, 'r') as input_file:
+                    source = input_file.read()
+                profiler = Profiler()
+                words = assembler.assemble(source, profiler)
+                output_path = os.path.splitext(input_path)[0] + (
+                    ".hackb" if binary else ".hack")
+                with open(output_path, 'wb') as output_file:
+                    if binary:
+                        write_hackb(words, output_file)
+                    else:
+                        output_file.write(format_hack(words).encode())
+                print("%s: %s" % (output_path, "incremental"
+                                  if profiler.counters['incremental']
+                                  else "rebuilt"), file=sys.stderr)
+            except Exception as error:
+                print("%s: %s" % (input_path, error_message(error)),
+                      file=sys.stderr)
+        time.sleep(interval)
+
+
+def _is_up_to_date(output_path: str, output: bytes) -> bool:
+    try:
+        if os.path.getsize(output_path) != len(output):
+            return False
+        with open(output_path, 'rb') as output_file:
+            return output_file.read() == output
+    except FileNotFoundError:
+        return False
+
+
+def error_message(error: Exception) -> str:
+    """
+    Args:
+        error (Exception): an error raised while assembling.
+
+    Returns:
+        str: the message the error is reported with, e.g. to the user or
+        in the response of an AssemblerServer.
+    """
+    return "%s: %s" % (type(error).__name__, error)
+
+
+def profile_path(input_path: str, trace_memory: bool = False,
+                 **options) -> typing.Dict[str, typing.Any]:
+    """Assembles a file like assemble_path, under a fresh Profiler.
+
+    Args:
+        input_path (str): path of the file to assemble.
+        trace_memory (bool): trace the memory allocated by every phase.
+        **options: passed on to assemble_path.
+
+    Returns:
+        typing.Dict[str, typing.Any]: the report of the profiler.
+    """
+    profiler = Profiler(trace_memory)
+    assemble_path(input_path, profiler=profiler, **options)
+    return profiler.report()
+
+
+def assemble_paths(
+        input_paths: typing.List[str], jobs: int = 1, profile: bool = False,
+        trace_memory: bool = False, **options
+) -> typing.List[typing.Tuple[str, typing.Optional[str],
+                              typing.Optional[typing.Dict[str, typing.Any]]]]:
+    """Assembles several files, optionally across a pool of processes.
+
+    A file that fails to assemble does not stop the others. Results are
+    reported in the order of input_paths, whatever order the workers
+    finish in.
+
+    Args:
+        input_paths (typing.List[str]): paths of the files to assemble.
+        jobs (int): number of worker processes, 1 assembles in this process.
+        profile (bool): profile every file, see profile_path.
+        trace_memory (bool): trace the memory of every phase when
+            profiling.
+        **options: passed on to assemble_path.
+
+    Returns:
+        typing.List[typing.Tuple[str, typing.Optional[str],
+        typing.Optional[typing.Dict[str, typing.Any]]]]: a triple for every
+        input path of the path, the error message or None if the file was
+        assembled successfully, and the profile report or None.
+    """
+    worker = functools.partial(profile_path, trace_memory=trace_memory) \
+        if profile else assemble_path
+    results = []
+    if jobs <= 1 or len(input_paths) <= 1:
+        for input_path in input_paths:
+            try:
+                result = worker(input_path, **options)
+                results.append((input_path, None, result if profile else None))
+            except Exception as error:
+                results.append((input_path, error_message(error), None))
+        return results
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(worker, input_path, **options)
+                   for input_path in input_paths]
+        for input_path, future in zip(input_paths, futures):
+            try:
+                result = future.result()
+                results.append((input_path, None, result if profile else None))
+            except Exception as error:
+                results.append((input_path, error_message(error), None))
+    return results
 
 
 if "__main__" == __name__:
-    # Parses the input path and calls assemble_file on each input file.
-    # This opens both the input and the output files!
-    # Both are closed automatically when the code finishes running.
-    # If the output file does not exist, it is created automatically in the
+    # Parses the input path and assembles each input file.
+    # If an output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: Assembler <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    argument_parser = argparse.ArgumentParser(prog="Assembler")
+    argument_parser.add_argument("input_path")
+    argument_parser.add_argument(
+        "--single-pass", action="store_true",
+        help="assemble with one pass and backpatch label references")
+    argument_parser.add_argument(
+        "--binary", action="store_true",
+        help="write packed .hackb files instead of textual .hack files")
+    argument_parser.add_argument(
+        "--stream", action="store_true",
+        help="stream the input twice instead of loading it, for huge files")
+    argument_parser.add_argument(
+        "-O", "--optimize", action="store_true",
+        help="remove redundant instructions with a peephole optimizer. It "
+             "moves the labels, so a program that jumps to a numeric "
+             "address is left as it is, and a program that computes "
+             "addresses from the values of labels must not use it")
+    argument_parser.add_argument(
+        "-j", "--jobs", type=int, default=1, metavar="N",
+        help="assemble the files of a directory with N worker processes")
+    argument_parser.add_argument(
+        "--no-cache", action="store_true",
+        help="always assemble, without consulting the build cache")
+    argument_parser.add_argument(
+        "--cache-dir", default=DEFAULT_DIRECTORY,
+        help="directory of the build cache (default: %(default)s)")
+    argument_parser.add_argument(
+        "--cache-size", type=int, default=DEFAULT_MAX_BYTES // 2 ** 20,
+        metavar="MB",
+        help="size cap of the build cache (default: %(default)s)")
+    argument_parser.add_argument(
+        "--watch", action="store_true",
+        help="reassemble the files incrementally whenever they change")
+    argument_parser.add_argument(
+        "--profile", action="store_true",
+        help="print a JSON line for every file with the time of each phase "
+             "and the instructions per second")
+    argument_parser.add_argument(
+        "--profile-memory", action="store_true",
+        help="with --profile, also trace the peak, net bytes and net blocks "
+             "each phase allocates with tracemalloc, which slows it down")
+    arguments = argument_parser.parse_args()
+    if arguments.stream and arguments.optimize:
+        argument_parser.error("--optimize cannot be combined with --stream")
+    argument_path = os.path.abspath(arguments.input_path)
     if os.path.isdir(argument_path):
         files_to_assemble = [
             os.path.join(argument_path, filename)
-            for filename in os.listdir(argument_path)]
+            for filename in sorted(os.listdir(argument_path))]
     else:
         files_to_assemble = [argument_path]
-    for input_path in files_to_assemble:
-        filename, extension = os.path.splitext(input_path)
-        if extension.lower() != ".asm":
-            continue
-        output_path = filename + ".hack"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            assemble_file(input_file, output_file)
+    files_to_assemble = [
+        input_path for input_path in files_to_assemble
+        if os.path.splitext(input_path)[1].lower() == ".asm"]
+    if arguments.watch:
+        if arguments.stream or arguments.optimize:
+            argument_parser.error(
+                "--watch cannot be combined with --stream or --optimize")
+        try:
+            watch_paths(files_to_assemble, arguments.binary)
+        except KeyboardInterrupt:
+            sys.exit(0)
+    failures = 0
+    for input_path, error, report in assemble_paths(
+            files_to_assemble, arguments.jobs, arguments.profile,
+            arguments.profile_memory,
+            single_pass=arguments.single_pass, binary=arguments.binary,
+            stream=arguments.stream, optimize=arguments.optimize,
+            cache_directory=(None if arguments.no_cache
+                             else arguments.cache_dir),
+            cache_size=arguments.cache_size * 2 ** 20):
+        if error is not None:
+            failures += 1
+            print("%s: %s" % (input_path, error), file=sys.stderr)
+        elif report is not None:
+            report = dict(report, file=input_path)
+            print(json.dumps(report))
+    if failures:
+        sys.exit("%d of %d files failed to assemble" % (
+            failures, len(files_to_assemble)))
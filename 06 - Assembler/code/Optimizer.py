@@ -0,0 +1,170 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Command import Command
+
+# Pairs of computations that undo each other when applied to the same
+# register one after the other, e.g. M=M+1 followed by M=M-1.
+_INVERSE_COMPS = {'D+1': 'D-1', 'D-1': 'D+1',
+                  'A+1': 'A-1', 'A-1': 'A+1',
+                  'M+1': 'M-1', 'M-1': 'M+1'}
+
+
+class Optimizer:
+    """
+    A peephole optimizer over decoded commands. It runs between parsing and
+    encoding, while labels are still symbolic, so removing a command simply
+    moves every later label up. The rewrites are:
+    - an A-command that loads the symbol A already holds is removed.
+    - a C-command that copies a register to itself (D=D, A=A, M=M) is
+      removed.
+    - @L followed by a jump that is immediately followed by (L) is removed,
+      when nothing after (L) reads the A register before overwriting it.
+    - two adjacent C-commands that increment and decrement the same
+      register (e.g. M=M+1, M=M-1) are removed.
+
+    The rewrites are repeated until none applies. Every rewrite keeps the
+    values of D, of the memory, and of A wherever A is read later on.
+
+    Removing a command also moves every later instruction to a lower ROM
+    address, so the optimized program only behaves like the original one
+    if every jump goes to a label, or to an address loaded from a label.
+    A program that jumps to a numeric address (e.g. @17 followed by 0;JMP)
+    is left as it is. A program that computes an address from the value of
+    a label (e.g. @LOOP, D=A, @3, A=D+A, 0;JMP) cannot be told apart from
+    one that does not, and must not be optimized.
+
+    Usage:
+        commands = Optimizer().optimize(commands)
+    """
+
+    def __init__(self) -> None:
+        """Creates an optimizer that has not removed any command yet."""
+        self.removed = 0
+
+    def optimize(self, commands: typing.List[Command]) -> typing.List[Command]:
+        """
+        Args:
+            commands (typing.List[Command]): the decoded commands of a
+                program, including its labels.
+
+        Returns:
+            typing.List[Command]: the optimized commands, or the commands
+            themselves if the program jumps to a numeric address.
+        """
+        if self.jumps_to_number(commands):
+            return commands
+        while True:
+            optimized = self._optimize_once(commands)
+            self.removed += len(commands) - len(optimized)
+            if len(optimized) == len(commands):
+                return optimized
+            commands = optimized
+
+    @staticmethod
+    def jumps_to_number(commands: typing.List[Command]) -> bool:
+        """
+        Args:
+            commands (typing.List[Command]): the decoded commands.
+
+        Returns:
+            bool: True if a jump command goes to the number of a numeric
+            A-command, which would no longer be the address of the same
+            instruction once commands are removed.
+        """
+        # A holds the number of a numeric A-command
+        numeric = False
+        for command in commands:
+            if command.type == 'A_COMMAND':
+                numeric = command.symbol.isnumeric()
+            elif command.type == 'L_COMMAND':
+                numeric = False
+            else:
+                if numeric and command.jump is not None:
+                    return True
+                if command.dest is not None and 'A' in command.dest:
+                    numeric = False
+        return False
+
+    def _optimize_once(
+            self, commands: typing.List[Command]) -> typing.List[Command]:
+        optimized = []
+        # the symbol A is known to hold, None if unknown
+        a_symbol = None
+        length = len(commands)
+        index = 0
+        while index < length:
+            command = commands[index]
+            following = commands[index + 1] if index + 1 < length else None
+            if command.type == 'L_COMMAND':
+                # control may reach a label with any value in A
+                a_symbol = None
+            elif command.type == 'A_COMMAND':
+                if command.symbol == a_symbol:
+                    index += 1
+                    continue
+                if following is not None and \
+                        following.type == 'C_COMMAND' and \
+                        following.jump is not None and \
+                        following.dest is None and \
+                        self._falls_into(commands, index + 2, command.symbol):
+                    index += 2
+                    continue
+                a_symbol = command.symbol
+            else:
+                if command.jump is None and command.dest == command.comp:
+                    index += 1
+                    continue
+                if command.jump is None and following is not None and \
+                        following.type == 'C_COMMAND' and \
+                        following.jump is None and \
+                        command.dest == following.dest and \
+                        command.dest == command.comp[0] and \
+                        _INVERSE_COMPS.get(command.comp) == following.comp:
+                    index += 2
+                    continue
+                if command.dest is not None and 'A' in command.dest:
+                    a_symbol = None
+            optimized.append(command)
+            index += 1
+        return optimized
+
+    @staticmethod
+    def _falls_into(commands: typing.List[Command], index: int,
+                    label: str) -> bool:
+        """
+        Args:
+            commands (typing.List[Command]): the decoded commands.
+            index (int): the index following a jump command.
+            label (str): the target of the jump.
+
+        Returns:
+            bool: True if the label is defined at index, so the jump goes to
+            the next instruction anyway, and the value the jump left in A is
+            overwritten before it is ever read.
+        """
+        length = len(commands)
+        found = False
+        while index < length and commands[index].type == 'L_COMMAND':
+            found |= commands[index].symbol == label
+            index += 1
+        if not found:
+            return False
+        while index < length:
+            command = commands[index]
+            if command.type == 'A_COMMAND':
+                return True
+            if command.type == 'C_COMMAND':
+                dest = command.dest or ''
+                if command.jump is not None or 'M' in dest or \
+                        'A' in command.comp or 'M' in command.comp:
+                    return False
+                if 'A' in dest:
+                    return True
+            index += 1
+        return True
@@ -6,14 +6,52 @@ as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import typing
+from Command import Command, decode_line
 
-def clean_line(line):
-    line = line.replace(' ', '')
-    for i in range(len(line)-1):
-        if line[i] == '/' and line[i+1] == '/':
-            line = line[:i]
+# Deletes the white space that may appear inside a line.
+_WHITE_SPACE = str.maketrans('', '', ' \t\f\v')
+
+
+def clean_source(source: str) -> typing.List[str]:
+    """Cleans a whole program at once: a single translate pass deletes the
+    white space of every line, then comments and empty lines are dropped.
+
+    Args:
+        source (str): the text of an assembly program.
+
+    Returns:
+        typing.List[str]: the command lines, without white space and comments.
+    """
+    return [line for line in (
+        line.partition('//')[0]
+        for line in source.translate(_WHITE_SPACE).splitlines()) if line]
+
+
+def stream_commands(input_file: typing.TextIO,
+                    chunk_size: int = 1 << 16) -> typing.Iterator[Command]:
+    """Reads the input in chunks and yields its commands one at a time, so
+    only a single chunk of the source is held in memory.
+
+    Args:
+        input_file (typing.TextIO): input file.
+        chunk_size (int): number of characters read at a time.
+
+    Yields:
+        Command: the decoded commands, in program order.
+    """
+    remainder = ''
+    while True:
+        chunk = input_file.read(chunk_size)
+        if not chunk:
             break
-    return line.strip()
+        text = remainder + chunk
+        # the last line may continue in the next chunk
+        end = max(text.rfind('\n'), text.rfind('\r')) + 1
+        remainder = text[end:]
+        for line in clean_source(text[:end]):
+            yield decode_line(line)
+    for line in clean_source(remainder):
+        yield decode_line(line)
 
 
 class Parser:
@@ -29,16 +67,20 @@ class Parser:
         Args:
             input_file (typing.TextIO): input file.
         """
-        # A good place to start is to read all the lines of the input:
-        # input_lines = input_file.read().splitlines()
-        self.input_lines = input_file.read().splitlines()
-        self.command_lines = []
-        for line in self.input_lines:
-            if len(line) != 0 and (line[0] != '/' and line[1] != '/'):
-                line = clean_line(line)
-                self.command_lines.append(line)
+        self.command_lines = clean_source(input_file.read())
         self.cur_index = 0
         self.len_command_lines = len(self.command_lines)
+        self.commands = None
+
+    def decode(self) -> typing.List[Command]:
+        """Decodes every command line once. Later calls return the same list.
+
+        Returns:
+            typing.List[Command]: the decoded commands, in program order.
+        """
+        if self.commands is None:
+            self.commands = [decode_line(line) for line in self.command_lines]
+        return self.commands
 
     def has_more_commands(self) -> bool:
         """Are there more commands in the input?
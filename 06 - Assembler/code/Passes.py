@@ -0,0 +1,88 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from SymbolTable import SymbolTable
+from Command import Command
+from Code import Code
+
+
+def first_pass(commands: typing.Iterable[Command],
+               symbol_table: SymbolTable) -> int:
+    """Adds the label of every L-command to the symbol table, at the ROM
+    address of the instruction that follows it.
+
+    Args:
+        commands (typing.Iterable[Command]): the commands of a program.
+        symbol_table (SymbolTable): the table the labels are added to.
+
+    Returns:
+        int: the number of instructions of the program.
+    """
+    rom_address = 0
+    for command in commands:
+        if command.type == 'L_COMMAND':
+            symbol_table.add_entry(command.symbol, rom_address)
+        else:
+            rom_address += 1
+    return rom_address
+
+
+def resolve_symbol(symbol_table: SymbolTable, symbol: str) -> int:
+    """
+    Args:
+        symbol_table (SymbolTable): the symbols known so far.
+        symbol (str): the symbol of an A-command.
+
+    Returns:
+        int: the address of the symbol, which is allocated as a new
+        variable if the table does not contain it.
+    """
+    address = symbol_table.lookup(symbol)
+    if address is None:
+        address = symbol_table.add_variable(symbol)
+    return address
+
+
+def encode_commands(
+        commands: typing.Iterable[Command], symbol_table: SymbolTable,
+        code: Code, on_new_variable: typing.Callable[[str, int], None] = None
+) -> typing.Iterator[int]:
+    """The second pass: encodes the instructions of a program whose labels
+    are all in the symbol table. Variables are allocated in the order they
+    are first referenced.
+
+    Args:
+        commands (typing.Iterable[Command]): the commands of a program.
+        symbol_table (SymbolTable): the table with the labels of the
+            program, variables are added to it.
+        code (Code): encodes the C-commands.
+        on_new_variable (typing.Callable[[str, int], None]): called with the
+            symbol and the ROM address of the instruction that allocated
+            each variable, if given.
+
+    Yields:
+        int: the 16-bit instructions, in program order.
+    """
+    rom_address = 0
+    for command in commands:
+        if command.type == 'A_COMMAND':
+            symbol = command.symbol
+            if symbol.isnumeric():
+                yield int(symbol)
+            else:
+                address = symbol_table.lookup(symbol)
+                if address is None:
+                    address = symbol_table.add_variable(symbol)
+                    if on_new_variable is not None:
+                        on_new_variable(symbol, rom_address)
+                yield address
+        elif command.type == 'C_COMMAND':
+            yield code.instruction(command.comp, command.dest, command.jump)
+        else:
+            continue
+        rom_address += 1
@@ -0,0 +1,111 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import contextlib
+import json
+import time
+import tracemalloc
+import typing
+
+
+class Profiler:
+    """
+    Collects the wall time of each phase of an assembly, plus the number of
+    instructions produced and any named counters (e.g. the statistics of the
+    symbol table).
+
+    With trace_memory, the memory each phase allocates is traced with
+    tracemalloc, which slows the phases down several times, so their times
+    are only comparable with those of other traced runs. Every phase then
+    also records:
+    - peak_bytes: the most memory the phase had allocated at once, so that
+      memory allocated and freed within the phase is counted too.
+    - net_bytes: the memory the phase allocated and did not free.
+    - net_blocks: the number of memory blocks the phase allocated and did
+      not free.
+
+    Usage:
+        profiler = Profiler()
+        words = assemble_words(input_file, profiler)
+        print(profiler.to_json())
+    """
+
+    def __init__(self, trace_memory: bool = False) -> None:
+        """Creates a profiler with no recorded phases.
+
+        Args:
+            trace_memory (bool): trace the memory allocated by every phase.
+        """
+        self.trace_memory = trace_memory
+        self.phases = {}
+        self.instructions = 0
+        self.counters = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> typing.Iterator[None]:
+        """Times the body of a with statement as the given phase. Repeated
+        phases of the same name add up, and phases must not be nested when
+        tracing memory.
+
+        Args:
+            name (str): the name of the phase.
+        """
+        record = self.phases.setdefault(name, {'seconds': 0.0})
+        if not self.trace_memory:
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                record['seconds'] += time.perf_counter() - start
+            return
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        blocks = len(tracemalloc.take_snapshot().traces)
+        tracemalloc.reset_peak()
+        size = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            net_blocks = len(tracemalloc.take_snapshot().traces) - blocks
+            if started:
+                tracemalloc.stop()
+            record['seconds'] += seconds
+            record['peak_bytes'] = max(record.get('peak_bytes', 0),
+                                       peak - size)
+            record['net_bytes'] = record.get('net_bytes', 0) + current - size
+            record['net_blocks'] = record.get('net_blocks', 0) + net_blocks
+
+    def report(self) -> typing.Dict[str, typing.Any]:
+        """
+        Returns:
+            typing.Dict[str, typing.Any]: the recorded phases, their total
+            time, the number of instructions and the instructions per
+            second, and the counters.
+        """
+        seconds = sum(record['seconds'] for record in self.phases.values())
+        return {'phases': self.phases,
+                'seconds': seconds,
+                'instructions': self.instructions,
+                'instructions_per_second':
+                    self.instructions / seconds if seconds else 0.0,
+                'counters': self.counters}
+
+    def to_json(self, **fields) -> str:
+        """
+        Args:
+            **fields: extra top level fields, e.g. the name of the file.
+
+        Returns:
+            str: the report as a single line of JSON.
+        """
+        report = dict(fields)
+        report.update(self.report())
+        return json.dumps(report)
@@ -5,12 +5,32 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import sys
+import types
+import typing
+
+# The predefined symbols of section 6.2.3 of the book. Built once and shared,
+# read-only, by the symbol tables of all files.
+PREDEFINED_SYMBOLS = types.MappingProxyType({sys.intern(symbol): address
+    for symbol, address in {
+        'SP': 0, 'LCL': 1, 'ARG': 2, 'THIS': 3, 'THAT': 4,
+        'R0': 0, 'R1': 1, 'R2': 2, 'R3': 3, 'R4': 4, 'R5': 5, 'R6': 6, 'R7': 7,
+        'R8': 8, 'R9': 9, 'R10': 10, 'R11': 11, 'R12': 12, 'R13': 13,
+        'R14': 14, 'R15': 15, 'SCREEN': 16384, 'KBD': 24576}.items()})
+
+FIRST_VARIABLE_ADDRESS = 16
 
 
 class SymbolTable:
     """
     A symbol table that keeps a correspondence between symbolic labels and 
     numeric addresses.
+
+    The predefined symbols are shared by all tables; the labels and
+    variables of a file live in a small overlay that shadows them. Symbols
+    are interned as they are added. The table counts the lookups made
+    through lookup(), the lookups that missed, and the labels and variables
+    added to it, see statistics().
     """
 
     def __init__(self) -> None:
@@ -18,10 +38,12 @@ class SymbolTable:
         and their pre-allocated RAM addresses, according to section 6.2.3 of the
         book.
         """
-        self.symbol_table = {'SP': 0, 'LCL': 1, 'ARG': 2, 'THIS': 3, 'THAT': 4,
-            'R0': 0, 'R1': 1, 'R2': 2, 'R3': 3, 'R4': 4, 'R5': 5, 'R6': 6, 'R7': 7, 'R8': 8,
-            'R9': 9, 'R10': 10, 'R11': 11, 'R12': 12, 'R13': 13, 'R14': 14, 'R15': 15,
-            'SCREEN': 16384, 'KBD': 24576}
+        self.symbol_table = {}
+        self.next_variable_address = FIRST_VARIABLE_ADDRESS
+        self.lookups = 0
+        self.misses = 0
+        self.labels = 0
+        self.variables = 0
 
     def add_entry(self, symbol: str, address: int) -> None:
         """Adds the pair (symbol, address) to the table.
@@ -30,7 +52,24 @@ class SymbolTable:
             symbol (str): the symbol to add.
             address (int): the address corresponding to the symbol.
         """
-        self.symbol_table[symbol] = address
+        self.symbol_table[sys.intern(symbol)] = address
+        self.labels += 1
+
+    def add_variable(self, symbol: str) -> int:
+        """Adds the symbol at the next free variable address in RAM,
+        starting at address 16.
+
+        Args:
+            symbol (str): the variable to add.
+
+        Returns:
+            int: the address allocated to the variable.
+        """
+        address = self.next_variable_address
+        self.symbol_table[sys.intern(symbol)] = address
+        self.next_variable_address += 1
+        self.variables += 1
+        return address
 
     def contains(self, symbol: str) -> bool:
         """Does the symbol table contain the given symbol?
@@ -41,7 +80,7 @@ class SymbolTable:
         Returns:
             bool: True if the symbol is contained, False otherwise.
         """
-        return symbol in self.symbol_table
+        return symbol in self.symbol_table or symbol in PREDEFINED_SYMBOLS
 
     def get_address(self, symbol: str) -> int:
         """Returns the address associated with the symbol.
@@ -52,5 +91,40 @@ class SymbolTable:
         Returns:
             int: the address associated with the symbol.
         """
-        return self.symbol_table[symbol]
+        address = self.symbol_table.get(symbol)
+        if address is None:
+            return PREDEFINED_SYMBOLS[symbol]
+        return address
+
+    def lookup(self, symbol: str) -> typing.Optional[int]:
+        """Resolves a symbol, counting the lookup once.
+
+        Args:
+            symbol (str): a symbol.
+
+        Returns:
+            typing.Optional[int]: the address associated with the symbol, or
+            None if the table does not contain it.
+        """
+        self.lookups += 1
+        address = self.symbol_table.get(symbol)
+        if address is None:
+            address = PREDEFINED_SYMBOLS.get(symbol)
+            if address is None:
+                self.misses += 1
+        return address
+
+    def reset_lookups(self) -> None:
+        """Resets the lookup and miss counts, e.g. between the versions of a
+        program that share the table."""
+        self.lookups = 0
+        self.misses = 0
 
+    def statistics(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: the lookup and miss counts, and the
+            number of labels and of variables defined by the file.
+        """
+        return {'lookups': self.lookups, 'misses': self.misses,
+                'labels': self.labels, 'variables': self.variables}
@@ -0,0 +1,207 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+Checks that every mode of the VM translator and of the assembler still
+produces programs that pass the tests of projects 7 and 8.
+
+Every test directory that has a compare file is copied aside, translated
+with the options of each mode, optionally assembled with the peephole
+optimizer of the assembler, and its .tst script is run by the CPU emulator
+of project 5. The check fails if any script fails in any mode, so a wrong
+rewrite of a program by one of the optimizers is caught by the tests
+rather than by hand.
+
+Usage:
+    python ModeCheck.py
+    python ModeCheck.py --modes optimize whole-program --jit
+"""
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import typing
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(
+    __file__)), os.pardir, os.pardir))
+sys.path.insert(0, os.path.join(
+    _ROOT, "08 - Virtual Machine, Continued (Control)", "code"))
+from Main import translate_program
+from VMOptimizer import VMOptimizer
+from WholeProgramOptimizer import WholeProgramOptimizer
+
+# The assembler and the CPU emulator have modules named like those of the
+# VM translator, so they are run in processes of their own.
+ASSEMBLER = os.path.join(_ROOT, "06 - Assembler", "code", "Main.py")
+EMULATOR = os.path.join(_ROOT, "05 - Computer Architecture", "code",
+                        "CPUEmulator.py")
+TEST_DIRECTORIES = [
+    os.path.join(_ROOT, "07 - Virtual Machine (Arithmetic)", "test"),
+    os.path.join(_ROOT, "08 - Virtual Machine, Continued (Control)", "test")]
+# The options of every mode: those of translate_program, and "assemble" for
+# the peephole optimizer of the assembler.
+MODES = {
+    'default': {},
+    'compact': {'compact': True},
+    'stack-cache': {'stack_cache': True},
+    'optimize': {'optimize': True},
+    'whole-program': {'whole_program': True},
+    'assembler-optimize': {'assemble': True},
+    'all': {'compact': True, 'stack_cache': True, 'optimize': True,
+            'whole_program': True, 'assemble': True},
+}
+_LOAD_ASM = re.compile(r"\bload\s+(\S+?)\.asm\b")
+
+
+def find_tests(directories: typing.List[str]) -> typing.List[str]:
+    """
+    Args:
+        directories (typing.List[str]): directories searched recursively.
+
+    Returns:
+        typing.List[str]: the paths of the .tst scripts of the translated
+        programs, those that have a compare file of the same name. The
+        scripts that load the .vm files into the VM emulator have none.
+    """
+    tests = []
+    for directory in directories:
+        for path, _, filenames in sorted(os.walk(directory)):
+            for filename in sorted(filenames):
+                name, extension = os.path.splitext(filename)
+                if extension == ".tst" and name + ".cmp" in filenames:
+                    tests.append(os.path.join(path, filename))
+    return tests
+
+
+def translate(directory: str, compact: bool = False,
+              stack_cache: bool = False, optimize: bool = False,
+              whole_program: bool = False) -> None:
+    """Translates the .vm files of a directory into <directory>.asm in it,
+    as the VM translator does. The bootstrap code is only written if the
+    program has a Sys.vm, as the scripts of the other tests set the
+    pointers themselves.
+
+    Args:
+        directory (str): a directory of .vm files.
+        compact (bool): write compact code.
+        stack_cache (bool): keep the top of the stack in D.
+        optimize (bool): optimize the commands of every file.
+        whole_program (bool): optimize all the files together.
+    """
+    filenames = sorted(filename for filename in os.listdir(directory)
+                       if os.path.splitext(filename)[1].lower() == ".vm")
+    output_path = os.path.join(directory, os.path.basename(directory) + ".asm")
+    with open(output_path, 'w') as output_file:
+        translate_program(
+            [os.path.join(directory, filename) for filename in filenames],
+            output_file, compact, stack_cache,
+            VMOptimizer() if optimize else None,
+            WholeProgramOptimizer() if whole_program else None,
+            bootstrap="Sys.vm" in filenames)
+
+
+def assemble(directory: str, script_path: str) -> None:
+    """Assembles the programs of a directory with the peephole optimizer,
+    and makes its script load the machine code instead of the assembly.
+
+    Args:
+        directory (str): a directory of .asm files.
+        script_path (str): the .tst script of the directory.
+
+    Raises:
+        RuntimeError: if the assembler fails.
+    """
+    result = subprocess.run(
+        [sys.executable, ASSEMBLER, "-O", "--no-cache", directory],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        universal_newlines=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stdout.strip())
+    with open(script_path, 'r') as script_file:
+        script = script_file.read()
+    with open(script_path, 'w') as script_file:
+        script_file.write(_LOAD_ASM.sub(r"load \1.hack", script))
+
+
+def run_mode(tests: typing.List[str], options: typing.Dict[str, bool],
+             directory: str, jit: bool = False) -> typing.List[str]:
+    """Runs every test in a mode.
+
+    Args:
+        tests (typing.List[str]): paths of .tst scripts.
+        options (typing.Dict[str, bool]): the options of the mode, see
+            MODES.
+        directory (str): an empty directory the tests are copied into.
+        jit (bool): run the scripts with the JITEmulator.
+
+    Returns:
+        typing.List[str]: a message for every test that failed.
+    """
+    options = dict(options)
+    assemble_programs = options.pop('assemble', False)
+    failures = []
+    scripts = []
+    for index, test in enumerate(tests):
+        source = os.path.dirname(test)
+        # the name of the directory is the name of the program
+        copy = os.path.join(directory, str(index), os.path.basename(source))
+        shutil.copytree(source, copy, ignore=lambda path, names: [
+            name for name in names if os.path.splitext(name)[1].lower()
+            not in (".vm", ".tst", ".cmp")])
+        script = os.path.join(copy, os.path.basename(test))
+        try:
+            translate(copy, **options)
+            if assemble_programs:
+                assemble(copy, script)
+        except (OSError, ValueError, RuntimeError) as error:
+            failures.append("%s: %s" % (os.path.relpath(test, _ROOT), error))
+            continue
+        scripts.append((test, script))
+    if not scripts:
+        return failures
+    result = subprocess.run(
+        [sys.executable, EMULATOR] + (["--jit"] if jit else []) +
+        [script for test, script in scripts],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        universal_newlines=True)
+    messages = {}
+    for line in result.stdout.splitlines():
+        path, _, message = line.rpartition(": ")
+        messages[path] = message
+    for test, script in scripts:
+        message = messages.get(script)
+        if message is None or "successfully" not in message:
+            failures.append("%s: %s" % (os.path.relpath(test, _ROOT),
+                                        message or result.stdout.strip()))
+    return failures
+
+
+if "__main__" == __name__:
+    argument_parser = argparse.ArgumentParser(
+        description="Runs the tests of projects 7 and 8 in every mode of "
+                    "the VM translator and the assembler.")
+    argument_parser.add_argument(
+        "--modes", nargs="+", choices=list(MODES), default=list(MODES),
+        help="the modes to check (default: all of them)")
+    argument_parser.add_argument(
+        "--jit", action="store_true",
+        help="run the scripts with the JITEmulator")
+    arguments = argument_parser.parse_args()
+
+    tests = find_tests(TEST_DIRECTORIES)
+    failed = 0
+    for mode in arguments.modes:
+        with tempfile.TemporaryDirectory() as directory:
+            failures = run_mode(tests, MODES[mode], directory, arguments.jit)
+        print("%-20s %d/%d passed" % (
+            mode, len(tests) - len(failures), len(tests)))
+        for failure in failures:
+            print("    " + failure)
+        failed += len(failures)
+    sys.exit(1 if failed else 0)
@@ -36,20 +36,108 @@ POS_TEMP = 5
 C_PUSH = "C_PUSH"
 C_POP = "C_POP"
 
+# The default number of buffered pieces of code that are written to the
+# output stream at once.
+FLUSH_SIZE = 4096
+
+# Templates of the calls and returns. The return address of a call is
+# labeled with the file name and the call counter, so the labels of
+# separately translated files never collide.
+CALL_TEMPLATE = ("@{function}$ret.{file}.{count}\nD=A\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+                 "@LCL\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+                 "@ARG\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+                 "@THIS\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+                 "@THAT\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+                 "@{offset}\nD=A\n@SP\nD=M-D\n@ARG\nM=D\n@SP\nD=M\n@LCL\nM=D\n"
+                 "@{function}\n0;JMP\n"
+                 "({function}$ret.{file}.{count})\n")
+RETURN_TEMPLATE = ("@LCL\nD=M\n@FRAME{count}\nM=D\n@5\nD=A\n@FRAME{count}\n"
+                   "A=M-D\nD=M\n@RET{count}\nM=D\n"
+                   "@SP\nA=M\nA=A-1\nD=M\n@ARG\nA=M\nM=D\n@SP\nM=M-1\n"
+                   "@ARG\nD=M+1\n@SP\nM=D\n@FRAME{count}\nA=M-1\nD=M\n@THAT\nM=D\n"
+                   "@2\nD=A\n@FRAME{count}\nA=M-D\nD=M\n@THIS\nM=D\n"
+                   "@3\nD=A\n@FRAME{count}\nA=M-D\nD=M\n@ARG\nM=D\n"
+                   "@4\nD=A\n@FRAME{count}\nA=M-D\nD=M\n@LCL\nM=D\n"
+                   "@RET{count}\nA=M\n0;JMP\n")
+
+# Compact code jumps to a single shared routine per program for every call,
+# return and comparison, see write_routines. Arguments are passed in D and
+# in R13-R15: the return address of a call or a comparison is passed in D,
+# a call also sets R13 to the address of the function and R14 to its number
+# of arguments.
+COMPACT_CALL_TEMPLATE = ("@{n_args}\nD=A\n@R14\nM=D\n"
+                         "@{function}\nD=A\n@R13\nM=D\n"
+                         "@{function}$ret.{file}.{count}\nD=A\n@$$CALL\n0;JMP\n"
+                         "({function}$ret.{file}.{count})\n")
+COMPACT_RETURN = "@$$RETURN\n0;JMP\n"
+ROUTINES = (
+    # a program that runs off the end of its code stops here, instead of
+    # falling into the routines
+    "($$HALT)\n@$$HALT\n0;JMP\n"
+    # saves the frame of the caller, whose return address is in D
+    "($$CALL)\n"
+    "@SP\nM=M+1\nA=M-1\nM=D\n"
+    "@LCL\nD=M\n@SP\nM=M+1\nA=M-1\nM=D\n"
+    "@ARG\nD=M\n@SP\nM=M+1\nA=M-1\nM=D\n"
+    "@THIS\nD=M\n@SP\nM=M+1\nA=M-1\nM=D\n"
+    "@THAT\nD=M\n@SP\nM=M+1\nA=M-1\nM=D\n"
+    "@R14\nD=M\n@5\nD=D+A\n@SP\nD=M-D\n@ARG\nM=D\n"
+    "@SP\nD=M\n@LCL\nM=D\n"
+    "@R13\nA=M\n0;JMP\n"
+    # R13 holds the frame, R14 the return address
+    "($$RETURN)\n"
+    "@LCL\nD=M\n@R13\nM=D\n"
+    "@5\nA=D-A\nD=M\n@R14\nM=D\n"
+    "@SP\nAM=M-1\nD=M\n@ARG\nA=M\nM=D\n"
+    "@ARG\nD=M+1\n@SP\nM=D\n"
+    "@R13\nAM=M-1\nD=M\n@THAT\nM=D\n"
+    "@R13\nAM=M-1\nD=M\n@THIS\nM=D\n"
+    "@R13\nAM=M-1\nD=M\n@ARG\nM=D\n"
+    "@R13\nAM=M-1\nD=M\n@LCL\nM=D\n"
+    "@R14\nA=M\n0;JMP\n")
+# R15 holds the return address of a comparison
+COMPARISON_ROUTINE = ("($${name})\n"
+                      "@R15\nM=D\n"
+                      "@SP\nAM=M-1\nD=M\nA=A-1\nD=M-D\nM=-1\n"
+                      "@$${name}_TRUE\nD;{jump}\n"
+                      "@SP\nA=M-1\nM=0\n"
+                      "($${name}_TRUE)\n"
+                      "@R15\nA=M\n0;JMP\n")
 
-class CodeWriter:
-    """Translates VM commands into Hack assembly code."""
 
-    def __init__(self, output_stream: typing.TextIO) -> None:
+class CodeWriter:
+    """Translates VM commands into Hack assembly code.
+
+    The code of every arithmetic command is built once per file, as a
+    template in which only the label counter is substituted, and the code of
+    every distinct push/pop command is built once per file as well. The code
+    is collected in a buffer and written in bulk: by drain() once the buffer
+    holds flush_size pieces of code, so memory does not grow with the input,
+    and by flush(), which must be called once the translation is done.
+
+    In compact mode, calls, returns and comparisons jump to routines that
+    are shared by the whole program instead of being inlined. The routines
+    must then be written once per program, with write_routines.
+    """
+
+    def __init__(self, output_stream: typing.TextIO, compact: bool = False,
+                 flush_size: int = FLUSH_SIZE) -> None:
         """Initializes the CodeWriter.
 
         Args:
             output_stream (typing.TextIO): output stream.
+            compact (bool): write compact code, see write_routines.
+            flush_size (int): the number of buffered pieces of code at which
+                drain writes them.
         """
         self.output_file = output_stream
+        self.compact = compact
+        self.flush_size = flush_size
+        self.buffer = []
         self.count = 0
         self.name = ""
         self.start = False
+        self.build_templates()
 
     def set_file_name(self, filename: str) -> None:
         """Informs the code writer that the translation of a new VM file is
@@ -72,6 +160,38 @@ class CodeWriter:
 
         self.name = filename
         self.start = True
+        self.build_templates()
+
+    def build_templates(self) -> None:
+        """Builds the code of the arithmetic commands for the current file,
+        and forgets the push/pop code of the previous file.
+        """
+        self.arithmetic = {ADD: self.add_sub("+"), SUB: self.add_sub("-"),
+                           NEG: self.neg_not("-"), NOT: self.neg_not("!"),
+                           OR: self.and_or("|"), AND: self.and_or("&"),
+                           S_RIGHT: self.shift(">>"), S_LEFT: self.shift("<<")}
+        # the two labels of a comparison are substituted for {0} and {1}
+        if self.compact:
+            self.comparisons = {EQ: self.compact_comp("EQ"),
+                                GT: self.compact_comp("GT"),
+                                LT: self.compact_comp("LT")}
+        else:
+            self.comparisons = {EQ: self.comp("JEQ"), GT: self.comp("JGT"),
+                                LT: self.comp("JLT")}
+        self.push_pop_cache = {}
+
+    def drain(self) -> None:
+        """Writes the buffered code to the output stream if the buffer is
+        full. Can be called between any two commands, as it does not end the
+        translation."""
+        if len(self.buffer) >= self.flush_size:
+            self.output_file.write("".join(self.buffer))
+            self.buffer.clear()
+
+    def flush(self) -> None:
+        """Writes the buffered code to the output stream."""
+        self.output_file.write("".join(self.buffer))
+        self.buffer.clear()
 
     def wrapper_arithmetic(self):
         return "@SP" + "\n" + "M=M-1\n" + "A=M\n" + "D=M\n" + \
@@ -91,15 +211,8 @@ class CodeWriter:
         return "@SP\n" + "A=M-1\n" + "M=M" + type + "\n"
 
     def comp(self, command):
-        if command == EQ:
-            command = "JEQ"
-        elif command == GT:
-            command = "JGT"
-        elif command == LT:
-            command = "JLT"
-        label1 = "LABEL_" + str(self.count) + self.name
-        label2 = "LABEL_" + str(self.count + 1) + self.name
-        self.count += 2
+        label1 = "LABEL_{0}" + self.name
+        label2 = "LABEL_{1}" + self.name
         return "@" + "SP" + "\n" + "M=M-1\n"+ "A=M\n" + "D" + "=M\n" \
                   + "@" + "SP" + "\n" + "M=M-1\n" +"A=M\n" \
                   + "A" + "=M\n" + "D=A-D\n" + "@" + label1 + "\n" \
@@ -109,6 +222,9 @@ class CodeWriter:
                   + "M=-1" + "\n" + "(" + label2 + ")" + "\n" +\
                   "@" + "SP" + "\n" + 'M=M+1\n'
 
+    def compact_comp(self, name):
+        label = "LABEL_{0}" + self.name
+        return "@" + label + "\nD=A\n@$$" + name + "\n0;JMP\n(" + label + ")\n"
 
     def write_arithmetic(self, command: str) -> None:
         """Writes assembly code that is the translation of the given
@@ -119,30 +235,14 @@ class CodeWriter:
         Args:
             command (str): an arithmetic command.
         """
-        assembly_command = ""
-        if command == ADD:
-            assembly_command = self.add_sub("+")
-        if command == SUB:
-            assembly_command = self.add_sub("-")
-        if command == NEG:
-            assembly_command = self.neg_not("-")
-        if command == NOT:
-            assembly_command = self.neg_not("!")
-        if command == OR:
-            assembly_command = self.and_or("|")
-        if command == AND:
-            assembly_command = self.and_or("&")
-        if command == S_RIGHT:
-            assembly_command = self.shift(">>")
-        if command == S_LEFT:
-            assembly_command = self.shift("<<")
-        if command == EQ :
-            assembly_command = self.comp(command)
-        if command == LT :
-            assembly_command = self.comp(command)
-        if command == GT:
-            assembly_command = self.comp(command)
-        self.output_file.write(assembly_command)
+        assembly_command = self.arithmetic.get(command)
+        if assembly_command is None:
+            template = self.comparisons.get(command)
+            if template is None:
+                return
+            assembly_command = template.format(self.count, self.count + 1)
+            self.count += 2
+        self.buffer.append(assembly_command)
 
     def wrapper_push(self):
         return "@" + "SP\n" + "A=M\n" + "M=D\n" + "@" + "SP\n" + "M=M+1\n"
@@ -215,30 +315,38 @@ class CodeWriter:
             segment (str): the memory segment to operate on.
             index (int): the index in the memory segment.
         """
-        assembly_command = ""
-        if command == C_PUSH:
-            assembly_command = self.push(segment, index)
-        if command == C_POP:
-            assembly_command = self.pop(segment, index)
-        self.output_file.write(assembly_command)
+        key = (command, segment, index)
+        assembly_command = self.push_pop_cache.get(key)
+        if assembly_command is None:
+            assembly_command = ""
+            if command == C_PUSH:
+                assembly_command = self.push(segment, index)
+            if command == C_POP:
+                assembly_command = self.pop(segment, index)
+            self.push_pop_cache[key] = assembly_command
+        self.buffer.append(assembly_command)
 
 
     def write_init(self):
         command = "@256\nD=A\n@SP\nM=D\n"
-        self.output_file.write(command)
+        self.buffer.append(command)
         self.write_call("Sys.init", 0)
 
     def write_label(self, label: str) -> None:
         command = "(" + label + ")\n"
-        self.output_file.write(command)
+        self.buffer.append(command)
 
     def write_go_to(self, label: str) -> None:
         command = "@"+label+"\n0;JMP\n"
-        self.output_file.write(command)
+        self.buffer.append(command)
 
     def write_if(self, label: str) -> None:
         command = "@SP\nM=M-1\nA=M\nD=M\n@"+label+"\nD;JNE\n"
-        self.output_file.write(command)
+        self.buffer.append(command)
+
+    def write_if_false(self, label: str) -> None:
+        command = "@SP\nM=M-1\nA=M\nD=M\n@"+label+"\nD;JEQ\n"
+        self.buffer.append(command)
 
     def write_function(self, function_name: str, n_vars: int) -> None:
         self.write_label(function_name)
@@ -246,32 +354,28 @@ class CodeWriter:
             self.write_push_pop(C_PUSH, CONST, 0)
 
     def write_call(self, function_name: str, n_args: int) -> None:
-        str_count = str(self.count)
-        self.output_file.write("@" + function_name + "$ret" + str_count +
-                               "\nD=A\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
-                               "@LCL\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
-                               "@ARG\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
-                               "@THIS\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
-                               "@THAT\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
-                               "@" + str(5+n_args) + "\nD=A\n@SP\nD=M-D\n@ARG\nM=D\n@SP\nD=M\n@LCL\nM=D\n")
-        self.write_go_to(function_name)
-        self.write_label(function_name + "$ret" + str_count)
+        if self.compact:
+            self.buffer.append(COMPACT_CALL_TEMPLATE.format(
+                function=function_name, file=self.name, count=self.count,
+                n_args=n_args))
+        else:
+            self.buffer.append(CALL_TEMPLATE.format(
+                function=function_name, file=self.name, count=self.count,
+                offset=5 + n_args))
         self.count += 1
 
     def write_return(self) -> None:
-        str_count = str(self.count)
-        self.output_file.write("@LCL\nD=M\n@FRAME" + str_count + "\nM=D\n" + "@5\nD=A\n@FRAME" +
-                               str_count + "\nA=M-D\nD=M\n@RET"+ str_count + "\nM=D\n"
-                               "@SP\nA=M\nA=A-1\nD=M\n@ARG\nA=M\nM=D\n@SP\nM=M-1\n"
-                               "@ARG\nD=M+1\n@SP\nM=D\n@FRAME" + str_count + "\nA=M-1\nD=M\n@THAT\nM=D\n"
-                               "@2\nD=A\n@FRAME" + str_count + "\nA=M-D\nD=M\n@THIS\nM=D\n"
-                               "@3\nD=A\n@FRAME" + str_count + "\nA=M-D\nD=M\n@ARG\nM=D\n"
-                               "@4\nD=A\n@FRAME" + str_count + "\nA=M-D\nD=M\n@LCL\nM=D\n"
-                               "@RET" + str_count + "\nA=M\n0;JMP\n")
+        if self.compact:
+            self.buffer.append(COMPACT_RETURN)
+        else:
+            self.buffer.append(RETURN_TEMPLATE.format(count=self.count))
         self.count += 1
 
-
-
-
-
-
+    def write_routines(self) -> None:
+        """Writes the routines shared by the compact code of a program:
+        $$CALL, $$RETURN, $$EQ, $$GT and $$LT, after the last function. They
+        are preceded by an infinite loop, so they are only reached by jumps.
+        """
+        self.buffer.append(ROUTINES)
+        for name, jump in (("EQ", "JEQ"), ("GT", "JGT"), ("LT", "JLT")):
+            self.buffer.append(COMPARISON_ROUTINE.format(name=name, jump=jump))
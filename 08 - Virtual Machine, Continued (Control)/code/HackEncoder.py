@@ -0,0 +1,119 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import os
+import sys
+import typing
+
+# The decoding and encoding of the instructions, the symbol table and the
+# .hack format are the assembler's.
+# Its directory is searched last, so that the modules of the VM translator
+# (e.g. its Parser) shadow the assembler's modules of the same name.
+ASSEMBLER_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir,
+    "06 - Assembler", "code")
+if ASSEMBLER_PATH not in sys.path:
+    sys.path.append(ASSEMBLER_PATH)
+from Code import Code
+from Command import decode_line
+from HackBinary import format_hack
+from Passes import resolve_symbol
+from SymbolTable import SymbolTable
+
+
+class HackEncoder:
+    """
+    An output stream for a CodeWriter that assembles the code written to it
+    into Hack machine words, so a program is translated from VM commands to
+    machine code without writing or parsing an .asm file.
+
+    The code is expected as the CodeWriter writes it: one command per line,
+    without white space or comments. A-instructions with a number and
+    C-instructions are encoded as they are written, each distinct line
+    once. A-instructions with a symbol are recorded and
+    resolved by words(), once all the labels are known. Variables are
+    allocated in the order they are first referenced, so the words are the
+    same as those the assembler gives for the .asm file.
+
+    Usage:
+        encoder = HackEncoder()
+        translate_program(input_paths, encoder)
+        output_file.write(format_hack(encoder.words()))
+    """
+
+    def __init__(self) -> None:
+        """Creates an encoder with no code written to it."""
+        self.symbol_table = SymbolTable()
+        self.instructions = []
+        # (index in instructions, symbol) of every A-instruction with a symbol
+        self.references = []
+        # line of an instruction that needs no symbol -> its encoding
+        self.encoded = {}
+        self.code = Code()
+        # the end of the last line written, if it did not end with a newline
+        self.remainder = ""
+
+    def write(self, text: str) -> int:
+        """Encodes assembly code.
+
+        Args:
+            text (str): lines of assembly code.
+
+        Returns:
+            int: the number of characters written.
+        """
+        lines = (self.remainder + text).split("\n")
+        self.remainder = lines.pop()
+        instructions = self.instructions
+        encoded = self.encoded
+        for line in lines:
+            word = encoded.get(line)
+            if word is not None:
+                instructions.append(word)
+            elif not line:
+                continue
+            elif line[0] == "@":
+                symbol = line[1:]
+                if symbol.isnumeric():
+                    word = int(symbol)
+                    encoded[line] = word
+                    instructions.append(word)
+                else:
+                    self.references.append((len(instructions), symbol))
+                    instructions.append(0)
+            elif line[0] == "(":
+                self.symbol_table.add_entry(line[1:-1], len(instructions))
+            else:
+                word = self.encode(line)
+                encoded[line] = word
+                instructions.append(word)
+        return len(text)
+
+    def encode(self, line: str) -> int:
+        """
+        Args:
+            line (str): a C-instruction.
+
+        Returns:
+            int: the 16-bit code of the instruction.
+        """
+        command = decode_line(line)
+        return self.code.instruction(command.comp, command.dest, command.jump)
+
+    def words(self) -> typing.List[int]:
+        """Resolves the symbols of the code written so far.
+
+        Returns:
+            typing.List[int]: the 16-bit instructions of the program.
+        """
+        self.write("\n")
+        symbol_table = self.symbol_table
+        instructions = self.instructions
+        for index, symbol in self.references:
+            instructions[index] = resolve_symbol(symbol_table, symbol)
+        self.references = []
+        return instructions
@@ -5,52 +5,319 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import concurrent.futures
+import io
 import os
-import sys
 import typing
-from Parser import Parser
-from CodeWriter import CodeWriter
+from Parser import CommandType, Command, parse_commands
+from CodeWriter import CodeWriter, FLUSH_SIZE
+from HackEncoder import HackEncoder, format_hack
+from StackCachingCodeWriter import StackCachingCodeWriter
+from VMOptimizer import VMOptimizer
+from WholeProgramOptimizer import WholeProgramOptimizer
+
+# The file name the bootstrap code is written under, which qualifies the
+# return address of its call to Sys.init. A .vm file cannot have it, as "$"
+# is not allowed in Jack class names.
+BOOTSTRAP_NAME = "$bootstrap"
+
+# The commands whose label is qualified by the function they appear in.
+LABEL_COMMANDS = {CommandType.C_LABEL, CommandType.C_GOTO, CommandType.C_IF}
+
+# Writes the translation of a command given its arguments, by type.
+WRITERS = {
+    CommandType.C_ARITHMETIC:
+        lambda code_writer, arg1, arg2: code_writer.write_arithmetic(arg1),
+    CommandType.C_PUSH: lambda code_writer, arg1, arg2:
+        code_writer.write_push_pop("C_PUSH", arg1, arg2),
+    CommandType.C_POP: lambda code_writer, arg1, arg2:
+        code_writer.write_push_pop("C_POP", arg1, arg2),
+    CommandType.C_LABEL:
+        lambda code_writer, arg1, arg2: code_writer.write_label(arg1),
+    CommandType.C_GOTO:
+        lambda code_writer, arg1, arg2: code_writer.write_go_to(arg1),
+    CommandType.C_IF:
+        lambda code_writer, arg1, arg2: code_writer.write_if(arg1),
+    CommandType.C_IF_FALSE:
+        lambda code_writer, arg1, arg2: code_writer.write_if_false(arg1),
+    CommandType.C_FUNCTION:
+        lambda code_writer, arg1, arg2: code_writer.write_function(arg1, arg2),
+    CommandType.C_RETURN:
+        lambda code_writer, arg1, arg2: code_writer.write_return(),
+    CommandType.C_CALL:
+        lambda code_writer, arg1, arg2: code_writer.write_call(arg1, arg2)}
+
+
+def read_commands(
+        commands: typing.Iterable[Command]) -> typing.Iterator[Command]:
+    """Qualifies the labels of the commands of a file by the function they
+    appear in.
+
+    Args:
+        commands (typing.Iterable[Command]): the commands of a file, e.g.
+            from parse_commands.
+
+    Yields:
+        Command: the commands, in order.
+    """
+    curr_label = ""
+    for command in commands:
+        command_type = command[0]
+        if command_type in LABEL_COMMANDS:
+            yield command_type, curr_label + command[1], None
+            continue
+        if command_type is CommandType.C_FUNCTION:
+            curr_label = command[1] + "$"
+        yield command
+
+
+def write_command(code_writer: CodeWriter, command: Command) -> None:
+    """Writes the translation of a single command.
+
+    Args:
+        code_writer (CodeWriter): writes the translation.
+        command (Command): a command, as returned by read_commands.
+    """
+    command_type, arg1, arg2 = command
+    WRITERS[command_type](code_writer, arg1, arg2)
 
 
 def translate_file(
         input_file: typing.TextIO, output_file: typing.TextIO,
-        bootstrap: bool) -> None:
-    """Translates a single file.
+        bootstrap: bool, compact: bool = False,
+        stack_cache: bool = False,
+        optimizer: VMOptimizer = None,
+        flush_size: int = FLUSH_SIZE) -> None:
+    """Translates a single file. The file is read a line at a time, so memory
+    does not grow with its size.
 
     Args:
         input_file (typing.TextIO): the file to translate.
         output_file (typing.TextIO): writes all output to this file.
         bootstrap (bool): if this is True, the current file is the 
             first file we are translating.
+        compact (bool): write compact code, whose shared routines are
+            written once per program by write_routines.
+        stack_cache (bool): keep the top of the stack in D, with a
+            StackCachingCodeWriter.
+        optimizer (VMOptimizer): optimizes the commands before they are
+            translated, if given.
+        flush_size (int): the number of buffered pieces of code that are
+            written to the output file at once.
     """
     # Your code goes here!
     file_name, input_extension = os.path.splitext(os.path.basename(input_file.name))
-    parser = Parser(input_file)
-    code_writer = CodeWriter(output_file)
+    translate_commands(file_name, read_commands(parse_commands(input_file)),
+                       output_file, bootstrap, compact, stack_cache, optimizer,
+                       flush_size)
+
+
+def translate_commands(
+        file_name: str, commands: typing.Iterable[Command],
+        output_file: typing.TextIO, bootstrap: bool, compact: bool = False,
+        stack_cache: bool = False, optimizer: VMOptimizer = None,
+        flush_size: int = FLUSH_SIZE) -> None:
+    """Translates the parsed commands of a single file.
+
+    Args:
+        file_name (str): the name of the file, without its extension.
+        commands (typing.Iterable[Command]): the commands, as returned by
+            read_commands. They are translated as they are read, except that
+            an optimizer holds the commands of one function at a time.
+        output_file (typing.TextIO): writes all output to this file.
+        bootstrap (bool): write the bootstrap code first.
+        compact (bool): write compact code, whose shared routines are
+            written once per program by write_routines.
+        stack_cache (bool): keep the top of the stack in D, with a
+            StackCachingCodeWriter.
+        optimizer (VMOptimizer): optimizes the commands before they are
+            translated, if given.
+        flush_size (int): the number of buffered pieces of code that are
+            written to the output file at once.
+    """
+    if stack_cache:
+        code_writer = StackCachingCodeWriter(output_file, compact, flush_size)
+    else:
+        code_writer = CodeWriter(output_file, compact, flush_size)
     code_writer.set_file_name(file_name)
-    curr_label = ""
     if bootstrap:
         code_writer.write_init()
-    while parser.has_more_commands():
-        parser.advance()
-        if parser.command_type() == "C_ARITHMETIC":
-            code_writer.write_arithmetic(parser.arg1())
-        elif parser.command_type() == "C_LABEL":
-            code_writer.write_label(curr_label + parser.arg1())
-        elif parser.command_type() == "C_GOTO":
-            code_writer.write_go_to(curr_label + parser.arg1())
-        elif parser.command_type() == "C_IF":
-            code_writer.write_if(curr_label + parser.arg1())
-        elif parser.command_type() == "C_FUNCTION":
-            curr_label = parser.arg1() + "$"
-            code_writer.write_function(parser.arg1(), parser.arg2())
-        elif parser.command_type() == "C_CALL":
-            code_writer.write_call(parser.arg1(), parser.arg2())
-        elif parser.command_type() == "C_RETURN":
-            code_writer.write_return()
-        else:
-            code_writer.write_push_pop(parser.command_type(), parser.arg1(), parser.arg2())
+    if optimizer is not None:
+        commands = optimizer.optimize_functions(commands)
+    for command in commands:
+        write_command(code_writer, command)
+        code_writer.drain()
+    code_writer.flush()
+
+
+def translate_path(input_path: str, compact: bool = False,
+                   stack_cache: bool = False,
+                   optimizer: VMOptimizer = None) -> str:
+    """Translates a single file into a fragment of assembly, without the
+    bootstrap code. This is a unit of work handed to worker processes by
+    translate_program.
+
+    Args:
+        input_path (str): path of the .vm file.
+        compact (bool): write compact code.
+        stack_cache (bool): keep the top of the stack in D.
+        optimizer (VMOptimizer): optimizes the commands, if given.
+
+    Returns:
+        str: the assembly code of the file.
+    """
+    output_file = io.StringIO()
+    with open(input_path, 'r') as input_file:
+        translate_file(input_file, output_file, False, compact, stack_cache,
+                       optimizer)
+    return output_file.getvalue()
+
+
+def translate_fragment(file_name: str, commands: typing.List[Command],
+                       compact: bool = False, stack_cache: bool = False,
+                       optimizer: VMOptimizer = None) -> str:
+    """Translates the parsed commands of a single file into a fragment of
+    assembly, without the bootstrap code. This is a unit of work handed to
+    worker processes by translate_program.
+
+    Args:
+        file_name (str): the name of the file, without its extension.
+        commands (typing.List[Command]): the commands of the file.
+        compact (bool): write compact code.
+        stack_cache (bool): keep the top of the stack in D.
+        optimizer (VMOptimizer): optimizes the commands, if given.
 
+    Returns:
+        str: the assembly code of the file.
+    """
+    output_file = io.StringIO()
+    translate_commands(file_name, commands, output_file, False, compact,
+                       stack_cache, optimizer)
+    return output_file.getvalue()
+
+
+def write_bootstrap(output_file: typing.TextIO,
+                    compact: bool = False) -> None:
+    """Writes the bootstrap code, which calls Sys.init.
+
+    Args:
+        output_file (typing.TextIO): writes all output to this file.
+        compact (bool): call Sys.init through the shared call routine.
+    """
+    code_writer = CodeWriter(output_file, compact)
+    code_writer.set_file_name(BOOTSTRAP_NAME)
+    code_writer.write_init()
+    code_writer.flush()
+
+
+def link(fragments: typing.List[str], output_file: typing.TextIO,
+         compact: bool = False, bootstrap: bool = True) -> None:
+    """Writes a program: the bootstrap code, then the fragments in the
+    given order, then the shared routines of compact code. The fragments
+    can be linked in any order, as every label of a fragment is qualified by
+    the name of its file or function.
+
+    Args:
+        fragments (typing.List[str]): the assembly code of every file.
+        output_file (typing.TextIO): writes all output to this file.
+        compact (bool): the fragments are compact code.
+        bootstrap (bool): write the bootstrap code first.
+    """
+    if bootstrap:
+        write_bootstrap(output_file, compact)
+    for fragment in fragments:
+        output_file.write(fragment)
+    if compact:
+        write_routines(output_file)
+
+
+def translate_program(
+        input_paths: typing.List[str], output_file: typing.TextIO,
+        compact: bool = False, stack_cache: bool = False,
+        optimizer: VMOptimizer = None,
+        program_optimizer: WholeProgramOptimizer = None,
+        jobs: int = 1, flush_size: int = FLUSH_SIZE,
+        bootstrap: bool = True) -> None:
+    """Translates the files of a program into a single output file. Every
+    file is translated on its own into a fragment, optionally across a pool
+    of processes, and the fragments are linked in the order of input_paths,
+    so the output does not depend on the number of jobs.
+
+    With a single job and no program_optimizer, every file is instead
+    streamed straight into the output file, so memory does not grow with
+    the size of the program.
+
+    The output is not byte-identical to that of the original translator,
+    though the programs behave the same:
+    - the command line links the files in sorted order, not in the order
+      os.listdir gives.
+    - the bootstrap code has a CodeWriter of its own, instead of that of
+      the first file, so the counters of the first file start one lower
+      (e.g. @FRAME2 instead of @FRAME3).
+    - return labels are qualified by the name of their file, so that
+      fragments can be linked in any order (e.g. Sys.main$ret.Sys.0
+      instead of Sys.main$ret1).
+
+    Args:
+        input_paths (typing.List[str]): paths of the .vm files.
+        output_file (typing.TextIO): writes all output to this file.
+        compact (bool): write compact code, and its shared routines.
+        stack_cache (bool): keep the top of the stack in D, with a
+            StackCachingCodeWriter.
+        optimizer (VMOptimizer): optimizes the commands of every file, if
+            given.
+        program_optimizer (WholeProgramOptimizer): optimizes all the files
+            together before they are translated, if given. The files are
+            then parsed in this process.
+        jobs (int): number of worker processes, 1 translates in this
+            process.
+        flush_size (int): the number of buffered pieces of code that are
+            written to the output file at once, when streaming.
+        bootstrap (bool): write the bootstrap code first. Programs without
+            Sys.init, such as the tests of single commands, run without it.
+    """
+    if program_optimizer is None and jobs <= 1:
+        if bootstrap:
+            write_bootstrap(output_file, compact)
+        for input_path in input_paths:
+            with open(input_path, 'r') as input_file:
+                translate_file(input_file, output_file, False, compact,
+                               stack_cache, optimizer, flush_size)
+        if compact:
+            write_routines(output_file)
+        return
+    if program_optimizer is None:
+        tasks = [(translate_path, input_path, compact, stack_cache, optimizer)
+                 for input_path in input_paths]
+    else:
+        program = []
+        for input_path in input_paths:
+            file_name = os.path.splitext(os.path.basename(input_path))[0]
+            with open(input_path, 'r') as input_file:
+                program.append((file_name, list(
+                    read_commands(parse_commands(input_file)))))
+        program = program_optimizer.optimize(program)
+        tasks = [(translate_fragment, file_name, commands, compact,
+                  stack_cache, optimizer) for file_name, commands in program]
+    if jobs <= 1 or len(tasks) <= 1:
+        fragments = [task[0](*task[1:]) for task in tasks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(*task) for task in tasks]
+            fragments = [future.result() for future in futures]
+    link(fragments, output_file, compact, bootstrap)
+
+
+def write_routines(output_file: typing.TextIO) -> None:
+    """Writes the routines shared by the compact code of all files.
+
+    Args:
+        output_file (typing.TextIO): writes all output to this file.
+    """
+    code_writer = CodeWriter(output_file, compact=True)
+    code_writer.write_routines()
+    code_writer.flush()
 
 
 if "__main__" == __name__:
@@ -59,25 +326,67 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: VMtranslator <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    argument_parser = argparse.ArgumentParser(prog="VMtranslator")
+    argument_parser.add_argument("input_path")
+    argument_parser.add_argument(
+        "--compact", action="store_true",
+        help="share the code of calls, returns and comparisons across the "
+             "program instead of inlining it")
+    argument_parser.add_argument(
+        "--stack-cache", action="store_true",
+        help="keep the top of the stack in the D register across commands")
+    argument_parser.add_argument(
+        "-O", "--optimize", action="store_true",
+        help="optimize the VM commands before translating them")
+    argument_parser.add_argument(
+        "--passes", default=",".join(VMOptimizer.PASSES),
+        help="comma-separated optimization passes to run with --optimize "
+             "(default: %(default)s)")
+    argument_parser.add_argument(
+        "--whole-program", action="store_true",
+        help="inline small leaf functions and remove the functions that are "
+             "never called from Sys.init")
+    argument_parser.add_argument(
+        "-j", "--jobs", type=int, default=1, metavar="N",
+        help="translate the files with N worker processes")
+    argument_parser.add_argument(
+        "--flush-size", type=int, default=FLUSH_SIZE, metavar="N",
+        help="write the output every N pieces of code (default: %(default)s)")
+    argument_parser.add_argument(
+        "--hack", action="store_true",
+        help="write the machine code of the program to a .hack file instead "
+             "of writing assembly")
+    arguments = argument_parser.parse_args()
+    optimizer = None
+    if arguments.optimize:
+        try:
+            optimizer = VMOptimizer(arguments.passes.split(","))
+        except ValueError as error:
+            argument_parser.error(str(error))
+    argument_path = os.path.abspath(arguments.input_path)
     if os.path.isdir(argument_path):
+        # sorted, so the order of the linked files does not depend on the
+        # file system
         files_to_translate = [
             os.path.join(argument_path, filename)
-            for filename in os.listdir(argument_path)]
+            for filename in sorted(os.listdir(argument_path))]
         output_path = os.path.join(argument_path, os.path.basename(
             argument_path))
     else:
         files_to_translate = [argument_path]
         output_path, extension = os.path.splitext(argument_path)
-    output_path += ".asm"
-    bootstrap = True
+    output_path += ".hack" if arguments.hack else ".asm"
+    files_to_translate = [
+        input_path for input_path in files_to_translate
+        if os.path.splitext(input_path)[1].lower() == ".vm"]
     with open(output_path, 'w') as output_file:
-        for input_path in files_to_translate:
-            filename, extension = os.path.splitext(input_path)
-            if extension.lower() != ".vm":
-                continue
-            with open(input_path, 'r') as input_file:
-                translate_file(input_file, output_file, bootstrap)
-            bootstrap = False
+        # the encoder assembles the code as it is written, and the words are
+        # written once all the labels are known
+        encoder = HackEncoder() if arguments.hack else None
+        translate_program(
+            files_to_translate, encoder or output_file, arguments.compact,
+            arguments.stack_cache, optimizer,
+            WholeProgramOptimizer() if arguments.whole_program else None,
+            arguments.jobs, arguments.flush_size)
+        if encoder is not None:
+            output_file.write(format_hack(encoder.words()))
@@ -5,9 +5,84 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import enum
 import typing
 
 
+class CommandType(str, enum.Enum):
+    """The type of a VM command. Members are equal to their names as
+    strings, e.g. CommandType.C_PUSH == "C_PUSH".
+    """
+    C_ARITHMETIC = "C_ARITHMETIC"
+    C_PUSH = "C_PUSH"
+    C_POP = "C_POP"
+    C_LABEL = "C_LABEL"
+    C_GOTO = "C_GOTO"
+    C_IF = "C_IF"
+    C_FUNCTION = "C_FUNCTION"
+    C_RETURN = "C_RETURN"
+    C_CALL = "C_CALL"
+    # not a VM command: a jump if the top of the stack is false, written by
+    # the VMOptimizer
+    C_IF_FALSE = "C_IF_FALSE"
+
+
+# A parsed VM command: its type and its arguments, None where the command
+# has none. The first argument of an arithmetic command is the command.
+Command = typing.Tuple[CommandType, typing.Optional[str], typing.Optional[int]]
+
+# The type of every command, by its first token.
+COMMAND_TYPES = {
+    "add": CommandType.C_ARITHMETIC, "sub": CommandType.C_ARITHMETIC,
+    "neg": CommandType.C_ARITHMETIC, "not": CommandType.C_ARITHMETIC,
+    "eq": CommandType.C_ARITHMETIC, "gt": CommandType.C_ARITHMETIC,
+    "lt": CommandType.C_ARITHMETIC, "and": CommandType.C_ARITHMETIC,
+    "or": CommandType.C_ARITHMETIC, "shiftright": CommandType.C_ARITHMETIC,
+    "shiftleft": CommandType.C_ARITHMETIC, "push": CommandType.C_PUSH,
+    "pop": CommandType.C_POP, "label": CommandType.C_LABEL,
+    "goto": CommandType.C_GOTO, "if-goto": CommandType.C_IF,
+    "function": CommandType.C_FUNCTION, "return": CommandType.C_RETURN,
+    "call": CommandType.C_CALL}
+
+
+def decode_line(line: str) -> typing.Optional[Command]:
+    """Tokenizes a line of a VM file, once, into a command record.
+
+    Args:
+        line (str): a line of a VM file.
+
+    Returns:
+        typing.Optional[Command]: the command of the line, or None if the
+        line has no command.
+    """
+    tokens = line.partition("//")[0].split()
+    if not tokens:
+        return None
+    command_type = COMMAND_TYPES[tokens[0]]
+    if command_type is CommandType.C_ARITHMETIC:
+        return command_type, tokens[0], None
+    if command_type is CommandType.C_RETURN:
+        return command_type, None, None
+    if len(tokens) == 2:
+        return command_type, tokens[1], None
+    return command_type, tokens[1], int(tokens[2])
+
+
+def parse_commands(lines: typing.Iterable[str]) -> typing.Iterator[Command]:
+    """
+    Args:
+        lines (typing.Iterable[str]): the lines of a VM file, e.g. the file
+            itself.
+
+    Yields:
+        Command: the commands of the lines, in order.
+    """
+    for line in lines:
+        command = decode_line(line)
+        if command is not None:
+            yield command
+
+
 class Parser:
     """
     # Parser
@@ -17,6 +92,11 @@ class Parser:
     access to their components. 
     In addition, it removes all white space and comments.
 
+    Each command is tokenized once, into a Command record, when the parser
+    is created. The records are also available through the commands()
+    generator. To translate a file without holding all its records, use
+    parse_commands on the file instead.
+
     ## VM Language Specification
 
     A .vm file is a stream of characters. If the file represents a
@@ -52,12 +132,22 @@ class Parser:
         Args:
             input_file (typing.TextIO): input file.
         """
-        self.input_lines = input_file.read().splitlines()
-        self.len_command_lines = len(self.input_lines)
+        self.records = list(parse_commands(input_file.read().splitlines()))
+        self.len_command_lines = len(self.records)
 
-        self.cur_command = ""
+        self.cur_command = None
         self.cur_index = 0
 
+    def commands(self) -> typing.Iterator[Command]:
+        """
+        Yields:
+            Command: the records of the remaining commands of the input, in
+            order. Each becomes the current command as it is yielded.
+        """
+        while self.has_more_commands():
+            self.advance()
+            yield self.cur_command
+
     def has_more_commands(self) -> bool:
         """Are there more commands in the input?
 
@@ -71,22 +161,8 @@ class Parser:
         command. Should be called only if has_more_commands() is true. Initially
         there is no current command.
         """
-
-        if self.has_more_commands():
-            self.cur_command = self.input_lines[self.cur_index]
-            self.cur_index += 1
-            while self.has_more_commands():
-                if (len(self.cur_command) == 0 or (self.cur_command[0] == "/" and self.cur_command[1] == "/")):
-                    self.cur_command = self.input_lines[self.cur_index]
-                else:
-                    break
-                self.cur_index += 1
-            for i in range(len(self.cur_command) - 1):
-                if self.cur_command[i] == "/" and self.cur_command[i + 1] == "/":
-                    self.cur_command = self.cur_command[:i]
-                    break
-            self.cur_command = self.cur_command.split()
-
+        self.cur_command = self.records[self.cur_index]
+        self.cur_index += 1
 
     def command_type(self) -> str:
         """
@@ -97,25 +173,7 @@ class Parser:
             "C_PUSH", "C_POP", "C_LABEL", "C_GOTO", "C_IF", "C_FUNCTION",
             "C_RETURN", "C_CALL".
         """
-        cur_command = self.cur_command
-        if cur_command[0] in {"add", "sub", "neg", "not", "eq", "gt", "lt", "and", "or", "shiftright", "shiftleft"}:
-            return "C_ARITHMETIC"
-        elif cur_command[0] == "push":
-            return "C_PUSH"
-        elif cur_command[0] == "pop":
-            return "C_POP"
-        elif cur_command[0] == "label":
-            return "C_LABEL"
-        elif cur_command[0] == "goto":
-            return "C_GOTO"
-        elif cur_command[0] == "if-goto":
-            return "C_IF"
-        elif cur_command[0] == "call":
-            return "C_CALL"
-        elif cur_command[0] == "function":
-            return "C_FUNCTION"
-        elif cur_command[0] == "return":
-            return "C_RETURN"
+        return self.cur_command[0]
 
     def arg1(self) -> str:
         """
@@ -124,8 +182,6 @@ class Parser:
             "C_ARITHMETIC", the command itself (add, sub, etc.) is returned. 
             Should not be called if the current command is "C_RETURN".
         """
-        if self.command_type() == "C_ARITHMETIC":
-            return self.cur_command[0]
         return self.cur_command[1]
 
 
@@ -136,4 +192,4 @@ class Parser:
             called only if the current command is "C_PUSH", "C_POP", 
             "C_FUNCTION" or "C_CALL".
         """
-        return int(self.cur_command[2])
\ No newline at end of file
+        return self.cur_command[2]
\ No newline at end of file
@@ -0,0 +1,221 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from CodeWriter import CodeWriter, ADD, SUB, NEG, NOT, AND, OR, S_RIGHT, \
+    S_LEFT, EQ, GT, LT, CONST, STATIC, LCL, ARG, THIS, THAT, POINT, TEMP, \
+    POS_LCL, POS_ARG, POS_THIS, POS_THAT, POS_TEMP, C_PUSH, C_POP, FLUSH_SIZE
+
+# The computation of each binary command, with the top of the stack (y) in D
+# and the value below it (x) in M, or in A for a folded operand.
+BINARY = {ADD: "D+{0}", SUB: "{0}-D", AND: "D&{0}", OR: "D|{0}"}
+# The same computations with the operands swapped: x in D and y in A or M.
+FOLDED = {ADD: "D+{0}", SUB: "D-{0}", AND: "D&{0}", OR: "D|{0}",
+          EQ: "D-{0}", GT: "D-{0}", LT: "D-{0}"}
+UNARY = {NEG: "-D", NOT: "!D", S_RIGHT: "D>>", S_LEFT: "D<<"}
+JUMPS = {EQ: "JEQ", GT: "JGT", LT: "JLT"}
+SEGMENTS = {LCL: POS_LCL, ARG: POS_ARG, THIS: POS_THIS, THAT: POS_THAT}
+# The largest index of a pointer segment (local, argument, this, that) that
+# is reached by incrementing A, which leaves D untouched. Larger indices are
+# added through D.
+MAX_INCREMENTS = 3
+# Pushes the value in D on the RAM stack.
+SPILL = "@SP\nM=M+1\nA=M-1\nM=D\n"
+# Pops the top of the RAM stack into D.
+FILL = "@SP\nAM=M-1\nD=M\n"
+
+
+class StackCachingCodeWriter(CodeWriter):
+    """
+    Translates VM commands into Hack assembly code that keeps the top of the
+    stack in the D register across commands, instead of writing every pushed
+    value to RAM and reading it back in the next command.
+
+    While the top of the stack is cached, SP points just past the values
+    that are still in RAM. The cached value is written to RAM ("spilled")
+    only when a command needs the whole stack in RAM: at labels, gotos,
+    calls, returns and at the end of the code. A push is also held back
+    until the next command, so that a push followed by a binary command or
+    a comparison reads its operand straight from memory or from A. For
+    example, "push local 0, push constant 5, add, pop static 1" becomes:
+        @LCL, A=M, D=M, @5, D=D+A, @File.1, M=D
+
+    Usage is the same as CodeWriter's.
+    """
+
+    def __init__(self, output_stream: typing.TextIO, compact: bool = False,
+                 flush_size: int = FLUSH_SIZE) -> None:
+        """Initializes the StackCachingCodeWriter.
+
+        Args:
+            output_stream (typing.TextIO): output stream.
+            compact (bool): jump to shared routines for calls and returns,
+                see CodeWriter.write_routines. Comparisons are always inlined.
+            flush_size (int): the number of buffered pieces of code at which
+                drain writes them.
+        """
+        super().__init__(output_stream, compact, flush_size)
+        # True if the top of the stack is in D rather than in RAM
+        self.cached = False
+        # the (segment, index) of a push that is not written yet, or None
+        self.pending = None
+
+    def operand(self, segment: str, index: int) -> typing.Optional[str]:
+        """
+        Args:
+            segment (str): the memory segment of a push.
+            index (int): the index in the memory segment.
+
+        Returns:
+            typing.Optional[str]: code that leaves the pushed value in A (for
+            constants) or in M, without touching D, or None if there is no
+            such code.
+        """
+        if segment == CONST:
+            return "@" + str(index) + "\n"
+        if segment == STATIC:
+            return "@" + self.name + "." + str(index) + "\n"
+        if segment == POINT:
+            return "@" + str(POS_THIS + index) + "\n"
+        if segment == TEMP:
+            return "@" + str(POS_TEMP + index) + "\n"
+        if segment in SEGMENTS and index <= MAX_INCREMENTS:
+            return "@" + str(SEGMENTS[segment]) + "\nA=M\n" + "A=A+1\n" * index
+        return None
+
+    def materialize(self) -> None:
+        """Writes the pending push, whose value becomes the cached top of
+        the stack."""
+        if self.pending is None:
+            return
+        segment, index = self.pending
+        self.pending = None
+        if self.cached:
+            self.buffer.append(SPILL)
+        operand = self.operand(segment, index)
+        if operand is None:
+            self.buffer.append("@" + str(index) + "\nD=A\n@" +
+                               str(SEGMENTS[segment]) + "\nA=D+M\nD=M\n")
+        elif segment == CONST:
+            self.buffer.append(operand + "D=A\n")
+        else:
+            self.buffer.append(operand + "D=M\n")
+        self.cached = True
+
+    def spill(self) -> None:
+        """Moves the whole stack to RAM."""
+        self.materialize()
+        if self.cached:
+            self.buffer.append(SPILL)
+            self.cached = False
+
+    def fill(self) -> None:
+        """Moves the top of the stack to D."""
+        self.materialize()
+        if not self.cached:
+            self.buffer.append(FILL)
+            self.cached = True
+
+    def flush(self) -> None:
+        """Moves the whole stack to RAM and writes the buffered code to the
+        output stream."""
+        self.spill()
+        super().flush()
+
+    def write_arithmetic(self, command: str) -> None:
+        """Writes assembly code that is the translation of the given
+        arithmetic command, with its result cached in D.
+
+        Args:
+            command (str): an arithmetic command.
+        """
+        if command in FOLDED and self.pending is not None and \
+                self.operand(*self.pending) is not None:
+            segment, index = self.pending
+            self.pending = None
+            if not self.cached:
+                self.buffer.append(FILL)
+            register = "A" if segment == CONST else "M"
+            self.buffer.append(self.operand(segment, index) + "D=" +
+                               FOLDED[command].format(register) + "\n")
+            self.cached = True
+            if command in JUMPS:
+                self.write_comparison(JUMPS[command])
+            return
+        self.fill()
+        if command in UNARY:
+            self.buffer.append("D=" + UNARY[command] + "\n")
+        elif command in BINARY:
+            self.buffer.append("@SP\nAM=M-1\nD=" +
+                               BINARY[command].format("M") + "\n")
+        elif command in JUMPS:
+            self.buffer.append("@SP\nAM=M-1\nD=M-D\n")
+            self.write_comparison(JUMPS[command])
+
+    def write_comparison(self, jump: str) -> None:
+        """Replaces the cached difference x-y by the result of a comparison.
+
+        Args:
+            jump (str): the jump mnemonic that is taken when the result is
+                true.
+        """
+        true_label = "LABEL_" + str(self.count) + self.name
+        end_label = "LABEL_" + str(self.count + 1) + self.name
+        self.count += 2
+        self.buffer.append("@" + true_label + "\nD;" + jump + "\nD=0\n@" +
+                           end_label + "\n0;JMP\n(" + true_label +
+                           ")\nD=-1\n(" + end_label + ")\n")
+
+    def write_push_pop(self, command: str, segment: str, index: int) -> None:
+        """Writes assembly code that is the translation of the given
+        command, where command is either C_PUSH or C_POP.
+
+        Args:
+            command (str): "C_PUSH" or "C_POP".
+            segment (str): the memory segment to operate on.
+            index (int): the index in the memory segment.
+        """
+        if command == C_PUSH:
+            self.materialize()
+            self.pending = (segment, index)
+            return
+        if command != C_POP:
+            return
+        self.fill()
+        self.cached = False
+        if segment in SEGMENTS and index > MAX_INCREMENTS:
+            self.buffer.append("@R13\nM=D\n@" + str(index) + "\nD=A\n@" +
+                               str(SEGMENTS[segment]) + "\nD=D+M\n@R14\n"
+                               "M=D\n@R13\nD=M\n@R14\nA=M\nM=D\n")
+        else:
+            self.buffer.append(self.operand(segment, index) + "M=D\n")
+
+    def write_label(self, label: str) -> None:
+        self.spill()
+        super().write_label(label)
+
+    def write_go_to(self, label: str) -> None:
+        self.spill()
+        super().write_go_to(label)
+
+    def write_if(self, label: str) -> None:
+        self.fill()
+        self.cached = False
+        self.buffer.append("@" + label + "\nD;JNE\n")
+
+    def write_if_false(self, label: str) -> None:
+        self.fill()
+        self.cached = False
+        self.buffer.append("@" + label + "\nD;JEQ\n")
+
+    def write_call(self, function_name: str, n_args: int) -> None:
+        self.spill()
+        super().write_call(function_name, n_args)
+
+    def write_return(self) -> None:
+        self.spill()
+        super().write_return()
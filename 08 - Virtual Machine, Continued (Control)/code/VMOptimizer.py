@@ -0,0 +1,227 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Parser import Command, CommandType
+
+# The largest value of "push constant".
+MAX_CONSTANT = 2 ** 15 - 1
+
+# The 16-bit results of the binary commands, as Python integers that are
+# reduced to 16 bits by _to_word.
+_BINARY = {"add": lambda x, y: x + y, "sub": lambda x, y: x - y,
+           "and": lambda x, y: x & y, "or": lambda x, y: x | y,
+           "eq": lambda x, y: -(x == y), "gt": lambda x, y: -(x > y),
+           "lt": lambda x, y: -(x < y)}
+_UNARY = {"neg": lambda x: -x, "not": lambda x: ~x,
+          "shiftleft": lambda x: x << 1, "shiftright": lambda x: x >> 1}
+_COMPARISONS = {"eq", "gt", "lt"}
+_JUMPS = {CommandType.C_GOTO, CommandType.C_IF, CommandType.C_IF_FALSE}
+_NOT = (CommandType.C_ARITHMETIC, "not", None)
+
+
+def _to_word(value: int) -> int:
+    """
+    Args:
+        value (int): an integer.
+
+    Returns:
+        int: the integer as a signed 16-bit word.
+    """
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def _is_constant(command: Command) -> bool:
+    return command[0] == CommandType.C_PUSH and command[1] == "constant"
+
+
+class VMOptimizer:
+    """
+    Optimizes the parsed commands of a VM file before they are translated.
+    Each pass can be turned on or off:
+    - "fold": folds arithmetic on constants, e.g. "push constant 2, push
+      constant 3, add" becomes "push constant 5", when the result is itself
+      a valid constant. Also removes "not, not".
+    - "dead": removes the commands that follow a goto or a return, up to
+      the next label or function.
+    - "thread": retargets jumps to a label that is followed by a goto to the
+      final target of the goto chain, removes gotos to the next command and
+      removes the labels that are no longer jumped to.
+    - "invert": inverts branches into "C_IF_FALSE" commands, which jump if
+      the top of the stack is zero (false). "if-goto A, goto B, label A"
+      becomes "C_IF_FALSE B, label A", and the "not, if-goto" that follows a
+      comparison, as emitted for while loops, becomes a single C_IF_FALSE.
+
+    The passes are repeated until none of them changes the commands.
+
+    Usage:
+        commands = VMOptimizer(passes=("fold", "dead")).optimize(commands)
+    """
+
+    PASSES = ("fold", "dead", "thread", "invert")
+
+    def __init__(self, passes: typing.Iterable[str] = PASSES) -> None:
+        """
+        Args:
+            passes (typing.Iterable[str]): the names of the passes to run.
+        """
+        passes = set(passes)
+        unknown = passes.difference(self.PASSES)
+        if unknown:
+            raise ValueError("unknown optimization passes: %s" %
+                             ", ".join(sorted(unknown)))
+        self.passes = [getattr(self, "_" + name)
+                       for name in self.PASSES if name in passes]
+
+    def optimize_functions(
+            self,
+            commands: typing.Iterable[Command]) -> typing.Iterator[Command]:
+        """Optimizes the commands one function at a time, which gives the
+        same commands as optimize, as no pass looks across a "function"
+        command. Only the commands of a single function are held at once.
+
+        Args:
+            commands (typing.Iterable[Command]): the commands of a VM file.
+
+        Yields:
+            Command: the optimized commands, in order.
+        """
+        function = []
+        for command in commands:
+            if command[0] == CommandType.C_FUNCTION and function:
+                yield from self.optimize(function)
+                function = []
+            function.append(command)
+        yield from self.optimize(function)
+
+    def optimize(self, commands: typing.List[Command]) -> typing.List[Command]:
+        """
+        Args:
+            commands (typing.List[Command]): the commands of a VM file.
+
+        Returns:
+            typing.List[Command]: the optimized commands.
+        """
+        while True:
+            optimized = commands
+            for optimization in self.passes:
+                optimized = optimization(optimized)
+            if optimized == commands:
+                return optimized
+            commands = optimized
+
+    @staticmethod
+    def _fold(commands: typing.List[Command]) -> typing.List[Command]:
+        optimized = []
+        for command in commands:
+            if command[0] == CommandType.C_ARITHMETIC:
+                operation = command[1]
+                if operation in _BINARY and len(optimized) >= 2 and \
+                        _is_constant(optimized[-1]) and \
+                        _is_constant(optimized[-2]):
+                    value = _to_word(_BINARY[operation](
+                        optimized[-2][2], optimized[-1][2]))
+                    if 0 <= value <= MAX_CONSTANT:
+                        optimized[-2:] = [
+                            (CommandType.C_PUSH, "constant", value)]
+                        continue
+                if operation in _UNARY and optimized and \
+                        _is_constant(optimized[-1]):
+                    value = _to_word(_UNARY[operation](optimized[-1][2]))
+                    if 0 <= value <= MAX_CONSTANT:
+                        optimized[-1] = (CommandType.C_PUSH, "constant", value)
+                        continue
+                if operation == "not" and optimized and \
+                        optimized[-1] == _NOT:
+                    optimized.pop()
+                    continue
+            optimized.append(command)
+        return optimized
+
+    @staticmethod
+    def _dead(commands: typing.List[Command]) -> typing.List[Command]:
+        optimized = []
+        reachable = True
+        for command in commands:
+            if command[0] in (CommandType.C_LABEL, CommandType.C_FUNCTION):
+                reachable = True
+            if reachable:
+                optimized.append(command)
+            if command[0] in (CommandType.C_GOTO, CommandType.C_RETURN):
+                reachable = False
+        return optimized
+
+    @staticmethod
+    def _thread(commands: typing.List[Command]) -> typing.List[Command]:
+        # label -> the target of the goto that follows it
+        forwards = {}
+        for index, command in enumerate(commands):
+            if command[0] == CommandType.C_LABEL:
+                following = index + 1
+                while following < len(commands) and \
+                        commands[following][0] == CommandType.C_LABEL:
+                    following += 1
+                if following < len(commands) and \
+                        commands[following][0] == CommandType.C_GOTO:
+                    forwards[command[1]] = commands[following][1]
+
+        def final_target(label: str) -> str:
+            visited = {label}
+            while label in forwards and forwards[label] not in visited:
+                label = forwards[label]
+                visited.add(label)
+            return label
+
+        threaded = [(command[0], final_target(command[1]), None)
+                    if command[0] in _JUMPS else command
+                    for command in commands]
+        # a goto to one of the labels right after it falls through anyway
+        optimized = []
+        for index, command in enumerate(threaded):
+            if command[0] == CommandType.C_GOTO:
+                following = index + 1
+                while following < len(threaded) and \
+                        threaded[following][0] == CommandType.C_LABEL and \
+                        threaded[following][1] != command[1]:
+                    following += 1
+                if following < len(threaded) and \
+                        threaded[following] == \
+                        (CommandType.C_LABEL, command[1], None):
+                    continue
+            optimized.append(command)
+        targets = {command[1] for command in optimized
+                   if command[0] in _JUMPS}
+        return [command for command in optimized
+                if command[0] != CommandType.C_LABEL or command[1] in targets]
+
+    @staticmethod
+    def _invert(commands: typing.List[Command]) -> typing.List[Command]:
+        optimized = []
+        index = 0
+        while index < len(commands):
+            command = commands[index]
+            window = commands[index:index + 3]
+            if len(window) == 3 and command[0] == CommandType.C_IF and \
+                    window[1][0] == CommandType.C_GOTO and \
+                    window[2] == (CommandType.C_LABEL, command[1], None):
+                optimized.append((CommandType.C_IF_FALSE, window[1][1], None))
+                optimized.append(window[2])
+                index += 3
+                continue
+            # only a comparison is known to leave exactly true (-1) or
+            # false (0), for which "not" is the same as inverting the jump
+            if len(window) >= 2 and command == _NOT \
+                    and window[1][0] == CommandType.C_IF and optimized and \
+                    optimized[-1][0] == CommandType.C_ARITHMETIC and \
+                    optimized[-1][1] in _COMPARISONS:
+                optimized.append((CommandType.C_IF_FALSE, window[1][1], None))
+                index += 2
+                continue
+            optimized.append(command)
+            index += 1
+        return optimized
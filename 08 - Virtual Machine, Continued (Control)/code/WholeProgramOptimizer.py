@@ -0,0 +1,225 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Parser import Command, CommandType
+
+# A program: the name of every VM file and its parsed commands, in order.
+Program = typing.List[typing.Tuple[str, typing.List[Command]]]
+
+# The function the bootstrap code calls.
+ENTRY_POINT = "Sys.init"
+# The number of slots of the temp segment, which hold the arguments and the
+# local variables of inlined functions.
+TEMP_SIZE = 8
+# The commands that access a segment, and those that refer to a label.
+_PUSH_POP = {CommandType.C_PUSH, CommandType.C_POP}
+_LABELED = {CommandType.C_LABEL, CommandType.C_GOTO, CommandType.C_IF,
+            CommandType.C_IF_FALSE}
+
+
+class Function:
+    """The commands of a single VM function and what is known about them."""
+
+    def __init__(self, file_name: str,
+                 commands: typing.List[Command]) -> None:
+        """
+        Args:
+            file_name (str): the name of the file that defines the function.
+            commands (typing.List[Command]): the commands of the function,
+                starting with its "function" command.
+        """
+        self.file_name = file_name
+        self.name = commands[0][1]
+        self.n_vars = commands[0][2]
+        self.body = commands[1:]
+        self.callees = {command[1] for command in self.body
+                        if command[0] == CommandType.C_CALL}
+        self.temps = {command[2] for command in self.body
+                      if command[0] in _PUSH_POP and
+                      command[1] == "temp"}
+        self.uses_statics = any(
+            command[0] in _PUSH_POP and command[1] == "static"
+            for command in self.body)
+        self.max_argument = max(
+            [command[2] for command in self.body
+             if command[0] in _PUSH_POP and
+             command[1] == "argument"], default=-1)
+        # a function that sets THIS or THAT would change them for its caller
+        # once inlined, as there is no frame to restore them from
+        self.sets_pointers = any(
+            command[0] == CommandType.C_POP and command[1] == "pointer"
+            for command in self.body)
+
+
+class WholeProgramOptimizer:
+    """
+    Optimizes all the VM files of a program together, using its call graph:
+    - small leaf functions, which call no other function, are inlined into
+      their callers.
+    - functions that cannot be reached from Sys.init are removed. This is
+      skipped if the program has no Sys.init.
+
+    An inlined function keeps its arguments and local variables in the temp
+    segment, in slots its body does not use. This is safe because a call
+    may change any slot of the temp segment, so no caller relies on them
+    across a call. Each of its returns becomes a jump to the end of the
+    inlined body, which assumes the function leaves nothing on the stack
+    but its return value, as the functions compiled from Jack do. Functions
+    that set pointer 0 or 1, that need more temp slots than are free, or
+    that use static variables and are called from another file, are not
+    inlined.
+
+    Usage:
+        program = WholeProgramOptimizer().optimize(program)
+    """
+
+    def __init__(self, inline_size: int = 16, eliminate: bool = True) -> None:
+        """
+        Args:
+            inline_size (int): the largest number of commands in the body of
+                an inlined function, 0 disables inlining.
+            eliminate (bool): remove the functions that are never called.
+        """
+        self.inline_size = inline_size
+        self.eliminate = eliminate
+        self.inlined = 0
+        self.eliminated = []
+
+    def optimize(self, program: Program) -> Program:
+        """
+        Args:
+            program (Program): the parsed files of the program, whose labels
+                are qualified by their function.
+
+        Returns:
+            Program: the optimized files, in the same order.
+        """
+        if self.inline_size > 0:
+            program = self._inline(program)
+        if self.eliminate:
+            program = self._eliminate(program)
+        return program
+
+    @staticmethod
+    def functions(program: Program) -> typing.Dict[str, Function]:
+        """
+        Args:
+            program (Program): the parsed files of a program.
+
+        Returns:
+            typing.Dict[str, Function]: every function of the program, by
+            name.
+        """
+        functions = {}
+        for file_name, commands in program:
+            starts = [index for index, command in enumerate(commands)
+                      if command[0] == CommandType.C_FUNCTION]
+            for start, end in zip(starts, starts[1:] + [len(commands)]):
+                function = Function(file_name, commands[start:end])
+                functions[function.name] = function
+        return functions
+
+    def _eliminate(self, program: Program) -> Program:
+        functions = self.functions(program)
+        if ENTRY_POINT not in functions:
+            return program
+        # the commands before the first function of a file are reachable too
+        reachable = set()
+        pending = [ENTRY_POINT]
+        for file_name, commands in program:
+            for command in commands:
+                if command[0] == CommandType.C_FUNCTION:
+                    break
+                if command[0] == CommandType.C_CALL:
+                    pending.append(command[1])
+        while pending:
+            name = pending.pop()
+            if name in reachable or name not in functions:
+                continue
+            reachable.add(name)
+            pending.extend(functions[name].callees)
+        optimized = []
+        for file_name, commands in program:
+            kept = []
+            keep = True
+            for command in commands:
+                if command[0] == CommandType.C_FUNCTION:
+                    keep = command[1] in reachable
+                    if not keep:
+                        self.eliminated.append(command[1])
+                if keep:
+                    kept.append(command)
+            optimized.append((file_name, kept))
+        return optimized
+
+    def _inline(self, program: Program) -> Program:
+        functions = self.functions(program)
+        candidates = {name: function for name, function in functions.items()
+                      if not function.callees and not function.sets_pointers
+                      and len(function.body) <= self.inline_size}
+        optimized = []
+        for file_name, commands in program:
+            inlined = []
+            for command in commands:
+                function = candidates.get(command[1]) \
+                    if command[0] == CommandType.C_CALL else None
+                body = None
+                if function is not None:
+                    body = self._inline_call(function, command[2], file_name)
+                if body is None:
+                    inlined.append(command)
+                else:
+                    inlined.extend(body)
+            optimized.append((file_name, inlined))
+        return optimized
+
+    def _inline_call(self, function: Function, n_args: int,
+                     file_name: str) -> typing.Optional[typing.List[Command]]:
+        """
+        Args:
+            function (Function): the called function.
+            n_args (int): the number of arguments of the call.
+            file_name (str): the file of the call.
+
+        Returns:
+            typing.Optional[typing.List[Command]]: the commands that replace
+            the call, or None if the call cannot be inlined.
+        """
+        if function.max_argument >= n_args or \
+                (function.uses_statics and function.file_name != file_name):
+            return None
+        # the first free run of temp slots for the arguments and the locals
+        size = n_args + function.n_vars
+        base = next((base for base in range(TEMP_SIZE - size + 1)
+                     if function.temps.isdisjoint(range(base, base + size))),
+                    None)
+        if base is None:
+            return None
+        suffix = ".inline" + str(self.inlined)
+        end_label = function.name + "$return" + suffix
+        self.inlined += 1
+        commands = [(CommandType.C_POP, "temp", base + argument)
+                    for argument in reversed(range(n_args))]
+        for local in range(function.n_vars):
+            commands.append((CommandType.C_PUSH, "constant", 0))
+            commands.append((CommandType.C_POP, "temp", base + n_args + local))
+        last = len(function.body) - 1
+        for index, (command_type, arg1, arg2) in enumerate(function.body):
+            if command_type in _LABELED:
+                commands.append((command_type, arg1 + suffix, None))
+            elif command_type == CommandType.C_RETURN:
+                if index != last:
+                    commands.append((CommandType.C_GOTO, end_label, None))
+            elif arg1 == "argument":
+                commands.append((command_type, "temp", base + arg2))
+            elif arg1 == "local":
+                commands.append((command_type, "temp", base + n_args + arg2))
+            else:
+                commands.append((command_type, arg1, arg2))
+        commands.append((CommandType.C_LABEL, end_label, None))
+        return commands